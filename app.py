@@ -1,20 +1,34 @@
 from flask import Flask
 from dotenv import load_dotenv
-from config.db import init_db
+import click
+from config.db import SessionLocal, engine, init_db
+from helpers.collection_stats import rebuild_collection_stats
+from helpers.cache_invalidation import start_invalidation_listener
+from helpers.capture_sampler import get_capture_sampler
+from helpers.migrations import apply_migrations
+from helpers.pokemon_stats import reload_pokemon_stats
+from helpers.trade_expiry import start_trade_sweeper
+from helpers.trade_locks import rebuild_trade_locks
 from routes.friends import friends
 from routes.pokemon_owned import pokemon_owned
 from routes.players import player
 from routes.capture import capture_pokemon
 from routes.trade import trade
+from events.presence import presence, start_presence_heartbeat
 from extensions import socketio, jwt
+from extensions.message_queue import socketio_options
+from notifications import start_notification_dispatcher
 
 app = Flask(__name__)
 
 load_dotenv()
 
 init_db(app)
+reload_pokemon_stats()
+get_capture_sampler()
 jwt.init_app(app)
-socketio.init_app(app)
+socketio.init_app(app, **socketio_options())
+presence.clear_worker()
 
 app.register_blueprint(player)
 app.register_blueprint(capture_pokemon)
@@ -22,5 +36,49 @@ app.register_blueprint(pokemon_owned)
 app.register_blueprint(friends)
 app.register_blueprint(trade)
 
+start_trade_sweeper()
+start_notification_dispatcher()
+start_presence_heartbeat()
+start_invalidation_listener()
+
+
+# flask apply-migrations (DDL de migrations/*.sql sobre tablas existentes)
+@app.cli.command("apply-migrations")
+def apply_migrations_command():
+    for name, applied, skipped in apply_migrations(engine):
+        click.echo(f"{name}: {applied} applied, {skipped} already in place")
+
+
+# flask rebuild-collection-stats [--player ID ...]
+@app.cli.command("rebuild-collection-stats")
+@click.option("--player", "player_ids", multiple=True)
+def rebuild_collection_stats_command(player_ids):
+    session = SessionLocal()
+    try:
+        rebuilt = rebuild_collection_stats(session, list(player_ids) or None)
+        session.commit()
+        click.echo(f"Rebuilt collection stats for {rebuilt} players")
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+# flask rebuild-trade-locks (backfill de trade_pokemon_lock desde los pendientes)
+@app.cli.command("rebuild-trade-locks")
+def rebuild_trade_locks_command():
+    session = SessionLocal()
+    try:
+        locked = rebuild_trade_locks(session)
+        session.commit()
+        click.echo(f"Locked {locked} Pokémon in pending trades")
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
 if __name__ == "__main__":
     socketio.run(app, host="0.0.0.0", port=5000)
@@ -1,7 +1,50 @@
-from flask import request
+import os
+
+from flask import current_app, request
+from flask_jwt_extended import decode_token
+from flask_socketio import emit, join_room
+
+from config.db import SessionLocal
+from events.presence import presence, user_room
 from extensions import socketio
+from helpers.friend_graph import get_friend_ids
+
+# Una reconexión dentro de esta ventana no avisa offline/online a los amigos
+PRESENCE_DEBOUNCE_SECONDS = float(os.getenv("PRESENCE_DEBOUNCE_SECONDS", "5"))
+
+online_announced = set()
+pending_offline = {}  # user_id -> token del aviso offline programado
+
+
+# Amigos desde el índice en memoria; solo toca la BD si no está cacheado
+def cached_friend_ids(user_id):
+    session = SessionLocal()
+    try:
+        return get_friend_ids(session, user_id)
+    finally:
+        session.close()
+
+
+def online_friend_ids(user_id):
+    return presence.online(cached_friend_ids(user_id))
+
+
+# Cada usuario tiene su room; con cola de mensajes cualquier worker le llega
+def notify_friends(user_id, event):
+    for friend_id in online_friend_ids(user_id):
+        socketio.emit(event, {"user_id": user_id}, room=user_room(friend_id))
 
-connected_users = {}
+
+def announce_offline_later(user_id, token):
+    socketio.sleep(PRESENCE_DEBOUNCE_SECONDS)
+
+    # Se reconectó o hubo otra desconexión después de esta
+    if pending_offline.get(user_id) is not token or presence.is_online(user_id):
+        return
+
+    del pending_offline[user_id]
+    online_announced.discard(user_id)
+    notify_friends(user_id, "friend_offline")
 
 
 @socketio.on("connect")
@@ -9,20 +52,46 @@ def handle_connect():
     print("Cliente conectado:", request.sid)
 
 
+# El usuario sale del JWT, no de lo que mande el cliente: sin esto cualquier
+# socket podía entrar a la room de otro y recibir sus notificaciones
+def token_identity(token):
+    if not token:
+        return None
+    try:
+        decoded = decode_token(token)
+    except Exception:
+        return None
+    return decoded.get(current_app.config["JWT_IDENTITY_CLAIM"])
+
+
 @socketio.on("connect_user")
 def connect_user(data):
-    user_id = data.get("user_id")
+    data = data or {}
+    user_id = token_identity(data.get("token"))
     sid = request.sid
 
-    connected_users[user_id] = sid
+    if user_id is None or data.get("user_id") not in (None, user_id):
+        emit("connect_user_error", {"message": "Invalid or missing token"})
+        return
+
+    presence.connect(user_id, sid)
+    join_room(user_room(user_id))
     print(f"Usuario {user_id} asociado al SID {sid}")
 
+    pending_offline.pop(user_id, None)
+    if user_id not in online_announced:
+        online_announced.add(user_id)
+        notify_friends(user_id, "friend_online")
+
 
 @socketio.on("disconnect")
 def disconnect_user():
-    sid = request.sid
-    for uid, stored_sid in list(connected_users.items()):
-        if stored_sid == sid:
-            del connected_users[uid]
-            print(f"Usuario {uid} desconectado")
-            break
+    uid = presence.disconnect(request.sid)
+    if uid is None or presence.is_online(uid):
+        return
+
+    print(f"Usuario {uid} desconectado")
+
+    token = object()
+    pending_offline[uid] = token
+    socketio.start_background_task(announce_offline_later, uid, token)
@@ -0,0 +1,250 @@
+import logging
+import os
+import socket
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, update
+
+from config.db import SessionLocal
+from extensions import socketio
+from models.models import PresenceSession
+
+PRESENCE_BACKEND = os.getenv("PRESENCE_BACKEND", "local")
+# Cada worker refresca last_seen de sus sockets; una fila sin refrescar en
+# PRESENCE_TTL_SECONDS es de un worker muerto y deja de contar (y se borra)
+PRESENCE_HEARTBEAT_SECONDS = float(os.getenv("PRESENCE_HEARTBEAT_SECONDS", "30"))
+PRESENCE_TTL_SECONDS = float(os.getenv("PRESENCE_TTL_SECONDS", "90"))
+
+logger = logging.getLogger(__name__)
+_heartbeat_started = False
+
+
+def user_room(user_id):
+    return f"user:{user_id}"
+
+
+# Registro en memoria de este proceso (un solo worker). Guarda los dos
+# sentidos, usuario -> sids y sid -> usuario, para que conectar y desconectar
+# sean O(1) y un usuario pueda tener varios dispositivos a la vez.
+class LocalPresence:
+    def __init__(self):
+        self.sids_by_user = {}
+        self.user_by_sid = {}
+        self.connects = 0
+        self.disconnects = 0
+        self._lock = threading.Lock()
+
+    def connect(self, user_id, sid):
+        with self._lock:
+            previous = self.user_by_sid.get(sid)
+            if previous == user_id:
+                return
+            if previous is not None:
+                self._forget(previous, sid)
+
+            self.user_by_sid[sid] = user_id
+            self.sids_by_user.setdefault(user_id, set()).add(sid)
+            self.connects += 1
+
+    # Regresa el usuario del socket o None
+    def disconnect(self, sid):
+        with self._lock:
+            user_id = self.user_by_sid.pop(sid, None)
+            if user_id is None:
+                return None
+
+            self._forget(user_id, sid)
+            self.disconnects += 1
+            return user_id
+
+    def _forget(self, user_id, sid):
+        sids = self.sids_by_user.get(user_id)
+        if sids is None:
+            return
+        sids.discard(sid)
+        if not sids:
+            del self.sids_by_user[user_id]
+
+    def is_online(self, user_id):
+        return user_id in self.sids_by_user
+
+    def online(self, user_ids):
+        return [user_id for user_id in user_ids if user_id in self.sids_by_user]
+
+    def stats(self):
+        return {
+            "backend": "local",
+            "connects": self.connects,
+            "disconnects": self.disconnects,
+            "active_sockets": len(self.user_by_sid),
+            "online_users": len(self.sids_by_user),
+        }
+
+    def clear_worker(self):
+        with self._lock:
+            self.sids_by_user.clear()
+            self.user_by_sid.clear()
+
+    # En memoria no hay filas de otros procesos que expirar
+    def heartbeat(self):
+        return 0
+
+
+# Registro compartido en la BD: todos los workers ven a todos los usuarios
+class SqlPresence:
+    def __init__(self):
+        self.worker = f"{socket.gethostname()}:{os.getpid()}"
+        self.connects = 0
+        self.disconnects = 0
+        self.expired = 0
+
+    def _alive_since(self):
+        return datetime.now() - timedelta(seconds=PRESENCE_TTL_SECONDS)
+
+    def connect(self, user_id, sid):
+        now = datetime.now()
+        session = SessionLocal()
+        try:
+            session.execute(delete(PresenceSession).where(PresenceSession.sid == sid))
+            session.add(
+                PresenceSession(
+                    sid=sid,
+                    user_id=user_id,
+                    worker=self.worker,
+                    connected_at=now,
+                    last_seen=now,
+                )
+            )
+            session.commit()
+            self.connects += 1
+        finally:
+            session.close()
+
+    def disconnect(self, sid):
+        session = SessionLocal()
+        try:
+            user_id = (
+                session.query(PresenceSession.user_id)
+                .filter(PresenceSession.sid == sid)
+                .scalar()
+            )
+            if user_id is not None:
+                session.execute(
+                    delete(PresenceSession).where(PresenceSession.sid == sid)
+                )
+                session.commit()
+                self.disconnects += 1
+            return user_id
+        finally:
+            session.close()
+
+    def is_online(self, user_id):
+        return bool(self.online([user_id]))
+
+    def online(self, user_ids):
+        user_ids = list(user_ids)
+        if not user_ids:
+            return []
+
+        session = SessionLocal()
+        try:
+            found = {
+                row.user_id
+                for row in session.query(PresenceSession.user_id)
+                .filter(
+                    PresenceSession.user_id.in_(user_ids),
+                    PresenceSession.last_seen >= self._alive_since(),
+                )
+                .distinct()
+            }
+        finally:
+            session.close()
+
+        return [user_id for user_id in user_ids if user_id in found]
+
+    # connects/disconnects son de este proceso; los activos son de todos
+    def stats(self):
+        session = SessionLocal()
+        try:
+            active_sockets, online_users = (
+                session.query(
+                    func.count(), func.count(PresenceSession.user_id.distinct())
+                )
+                .filter(PresenceSession.last_seen >= self._alive_since())
+                .one()
+            )
+        finally:
+            session.close()
+
+        return {
+            "backend": "sql",
+            "connects": self.connects,
+            "disconnects": self.disconnects,
+            "expired": self.expired,
+            "active_sockets": active_sockets,
+            "online_users": online_users,
+        }
+
+    # Al arrancar: borra lo que dejó un proceso anterior con el mismo pid
+    def clear_worker(self):
+        session = SessionLocal()
+        try:
+            session.execute(
+                delete(PresenceSession).where(PresenceSession.worker == self.worker)
+            )
+            session.commit()
+        finally:
+            session.close()
+
+    # Refresca los sockets de este worker y borra los que ningún worker vivo
+    # refrescó a tiempo. Regresa cuántas filas expiró
+    def heartbeat(self):
+        session = SessionLocal()
+        try:
+            session.execute(
+                update(PresenceSession)
+                .where(PresenceSession.worker == self.worker)
+                .values(last_seen=datetime.now())
+                .execution_options(synchronize_session=False)
+            )
+            expired = session.execute(
+                delete(PresenceSession)
+                .where(PresenceSession.last_seen < self._alive_since())
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            session.commit()
+            self.expired += expired
+            return expired
+        finally:
+            session.close()
+
+
+def make_presence(backend=PRESENCE_BACKEND):
+    if backend == "sql":
+        return SqlPresence()
+    if backend == "local":
+        return LocalPresence()
+    raise ValueError(f"Unknown PRESENCE_BACKEND: {backend}")
+
+
+presence = make_presence()
+
+
+def run_presence_heartbeat():
+    while True:
+        socketio.sleep(PRESENCE_HEARTBEAT_SECONDS)
+        try:
+            presence.heartbeat()
+        except Exception:
+            logger.exception("Presence heartbeat failed")
+
+
+def start_presence_heartbeat():
+    global _heartbeat_started
+
+    if _heartbeat_started or not isinstance(presence, SqlPresence):
+        return
+
+    _heartbeat_started = True
+    socketio.start_background_task(run_presence_heartbeat)
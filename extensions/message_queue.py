@@ -0,0 +1,92 @@
+import os
+import sqlite3
+import time
+
+import socketio as socketio_server
+
+SQLITE_QUEUE_POLL_SECONDS = float(os.getenv("SQLITE_QUEUE_POLL_SECONDS", "0.05"))
+SQLITE_QUEUE_RETENTION_SECONDS = 60
+
+
+# Cola de mensajes de Socket.IO sobre un archivo SQLite compartido por los
+# workers de un mismo nodo. Sirve para probar varios procesos sin Redis; en
+# producción se usa SOCKETIO_MESSAGE_QUEUE=redis://... (u otro soportado).
+class SQLitePubSubManager(socketio_server.PubSubManager):
+    name = "sqlite"
+
+    def __init__(self, url, channel="socketio", write_only=False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.path = url[len("sqlite:///") :]
+        self.published = 0
+
+        with self._connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS socketio_message ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, channel TEXT NOT NULL, "
+                "payload TEXT NOT NULL, created REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        return connection
+
+    def _publish(self, data):
+        connection = self._connect()
+        try:
+            connection.execute(
+                "INSERT INTO socketio_message (channel, payload, created) "
+                "VALUES (?, ?, ?)",
+                (self.channel, self.json.dumps(data), time.time()),
+            )
+
+            # Limpieza ocasional de mensajes que ya leyeron todos
+            self.published += 1
+            if self.published % 100 == 0:
+                connection.execute(
+                    "DELETE FROM socketio_message WHERE created < ?",
+                    (time.time() - SQLITE_QUEUE_RETENTION_SECONDS,),
+                )
+        finally:
+            connection.close()
+
+    def _listen(self):
+        connection = self._connect()
+        try:
+            last_id = connection.execute(
+                "SELECT COALESCE(MAX(id), 0) FROM socketio_message"
+            ).fetchone()[0]
+
+            while True:
+                rows = connection.execute(
+                    "SELECT id, payload FROM socketio_message "
+                    "WHERE id > ? AND channel = ? ORDER BY id",
+                    (last_id, self.channel),
+                ).fetchall()
+
+                for message_id, payload in rows:
+                    last_id = message_id
+                    yield payload
+
+                if not rows:
+                    self.server.sleep(SQLITE_QUEUE_POLL_SECONDS)
+        finally:
+            connection.close()
+
+
+# Opciones extra para socketio.init_app según el entorno
+def socketio_options():
+    options = {}
+
+    url = os.getenv("SOCKETIO_MESSAGE_QUEUE")
+    if url and url.startswith("sqlite:///"):
+        options["client_manager"] = SQLitePubSubManager(url)
+    elif url:
+        options["message_queue"] = url
+
+    # Con varios workers y sin sticky sessions solo funciona websocket
+    transports = os.getenv("SOCKETIO_TRANSPORTS")
+    if transports:
+        options["transports"] = transports.split(",")
+
+    return options
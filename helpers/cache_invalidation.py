@@ -0,0 +1,111 @@
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete
+
+from config.db import SessionLocal
+from extensions import socketio
+from helpers.ids import new_id
+from models.models import CacheInvalidation
+
+CACHE_INVALIDATION_POLL_SECONDS = float(
+    os.getenv("CACHE_INVALIDATION_POLL_SECONDS", "1")
+)
+# Se relee un poco hacia atrás: una transacción lenta puede hacer commit de
+# una fila con created_at anterior a la última lectura
+CACHE_INVALIDATION_SLACK_SECONDS = 10
+CACHE_INVALIDATION_RETENTION_SECONDS = 600
+
+logger = logging.getLogger(__name__)
+
+_listeners = []
+_seen = {}  # id -> created_at de las filas ya aplicadas dentro de la ventana
+_lock = threading.Lock()
+_started = False
+_polls = 0
+
+
+# Cada caché registra cómo tirar las entradas de unos jugadores
+def on_invalidate(callback):
+    _listeners.append(callback)
+
+
+def _apply(player_ids):
+    for callback in _listeners:
+        callback(*player_ids)
+
+
+# En la misma transacción que el cambio de amistad: los otros workers solo
+# lo ven si hay commit. Este worker ya invalida localmente después del commit
+def publish_invalidation(session, *player_ids):
+    now = datetime.now()
+    session.add_all(
+        CacheInvalidation(id=new_id(), player_id=player_id, created_at=now)
+        for player_id in set(player_ids)
+        if player_id
+    )
+
+
+def poll_invalidations():
+    global _polls
+
+    since = datetime.now() - timedelta(seconds=CACHE_INVALIDATION_SLACK_SECONDS)
+    session = SessionLocal()
+    try:
+        rows = (
+            session.query(
+                CacheInvalidation.id,
+                CacheInvalidation.player_id,
+                CacheInvalidation.created_at,
+            )
+            .filter(CacheInvalidation.created_at >= since)
+            .all()
+        )
+
+        _polls += 1
+        if _polls % 100 == 0:
+            session.execute(
+                delete(CacheInvalidation).where(
+                    CacheInvalidation.created_at
+                    < datetime.now()
+                    - timedelta(seconds=CACHE_INVALIDATION_RETENTION_SECONDS)
+                )
+            )
+            session.commit()
+    finally:
+        session.close()
+
+    with _lock:
+        new_rows = [row for row in rows if row.id not in _seen]
+        for row in new_rows:
+            _seen[row.id] = row.created_at
+        for row_id, created_at in list(_seen.items()):
+            if created_at < since:
+                del _seen[row_id]
+
+    player_ids = {row.player_id for row in new_rows}
+    if player_ids:
+        _apply(player_ids)
+    return len(player_ids)
+
+
+def run_invalidation_listener():
+    while True:
+        socketio.sleep(CACHE_INVALIDATION_POLL_SECONDS)
+        try:
+            poll_invalidations()
+        except Exception:
+            logger.exception("Cache invalidation poll failed")
+
+
+# Una green thread por proceso, como el sweeper de trades
+def start_invalidation_listener():
+    global _started
+
+    if _started:
+        return
+
+    _started = True
+    socketio.start_background_task(run_invalidation_listener)
@@ -0,0 +1,30 @@
+import threading
+
+from helpers.helpers import AliasSampler, capture_weights
+from helpers.pokemon_stats import get_pokemon_stats
+
+
+def build_capture_sampler(stats):
+    return AliasSampler(*capture_weights(stats.values()))
+
+
+# El sampler se reconstruye cuando el caché de pokemon_stat es otro objeto,
+# es decir, después de cada recarga de la tabla
+_sampler = None
+_sampler_source = None
+_sampler_lock = threading.Lock()
+
+
+def get_capture_sampler():
+    global _sampler, _sampler_source
+
+    stats = get_pokemon_stats()
+    sampler = _sampler
+    if _sampler_source is not stats:
+        with _sampler_lock:
+            if _sampler_source is not stats:
+                _sampler = build_capture_sampler(stats)
+                _sampler_source = stats
+            sampler = _sampler
+
+    return sampler
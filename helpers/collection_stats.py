@@ -0,0 +1,130 @@
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import delete, func, insert
+
+from helpers.pokemon_stats import get_pokemon_stat
+from models.models import PlayerCollectionStats, PokemonOwned
+
+REBUILD_BATCH = 1000
+
+
+def _add(counts, key, amount):
+    value = counts.get(key, 0) + amount
+    if value > 0:
+        counts[key] = value
+    else:
+        counts.pop(key, None)
+
+
+def _apply(totals, pokedex_number, amount):
+    stats = get_pokemon_stat(pokedex_number)
+
+    totals["total"] += amount
+    _add(totals["species"], str(pokedex_number), amount)
+    if stats.is_legendary:
+        totals["legendary"] += amount
+    for pokemon_type in {stats.type1, stats.type2} - {None}:
+        _add(totals["by_type"], pokemon_type, amount)
+    if stats.generation is not None:
+        _add(totals["by_generation"], str(stats.generation), amount)
+
+
+def _empty_totals():
+    return {
+        "total": 0,
+        "legendary": 0,
+        "species": {},
+        "by_type": {},
+        "by_generation": {},
+    }
+
+
+# Aplica lo capturado/borrado/intercambiado dentro de la transacción del
+# llamador. La fila se bloquea con FOR UPDATE para no perder incrementos.
+def apply_collection_delta(session, player_id, added=(), removed=()):
+    if not added and not removed:
+        return
+
+    row = (
+        session.query(PlayerCollectionStats)
+        .filter(PlayerCollectionStats.player_id == player_id)
+        .with_for_update()
+        .first()
+    )
+    if row is None:
+        row = PlayerCollectionStats(player_id=player_id)
+        session.add(row)
+        totals = _empty_totals()
+    else:
+        totals = {
+            "total": row.total,
+            "legendary": row.legendary,
+            "species": dict(row.species),
+            "by_type": dict(row.by_type),
+            "by_generation": dict(row.by_generation),
+        }
+
+    for pokedex_number in added:
+        _apply(totals, pokedex_number, 1)
+    for pokedex_number in removed:
+        _apply(totals, pokedex_number, -1)
+
+    row.total = totals["total"]
+    row.legendary = totals["legendary"]
+    row.species = totals["species"]
+    row.unique_species = len(totals["species"])
+    row.by_type = totals["by_type"]
+    row.by_generation = totals["by_generation"]
+    row.updated_at = datetime.now()
+
+
+# Un intercambio cambia las dos colecciones; se bloquean en orden fijo para
+# que dos confirmaciones cruzadas no hagan deadlock
+def apply_trade_delta(session, gains):
+    for player_id in sorted(gains):
+        added, removed = gains[player_id]
+        apply_collection_delta(session, player_id, added=added, removed=removed)
+
+
+def stats_row(player_id, counts):
+    totals = _empty_totals()
+    for pokedex_number, amount in counts.items():
+        _apply(totals, pokedex_number, amount)
+
+    return {
+        "player_id": player_id,
+        "total": totals["total"],
+        "unique_species": len(totals["species"]),
+        "legendary": totals["legendary"],
+        "species": totals["species"],
+        "by_type": totals["by_type"],
+        "by_generation": totals["by_generation"],
+        "updated_at": datetime.now(),
+    }
+
+
+# Recalcula la tabla completa desde pokemon_owned (backfill / reparación)
+def rebuild_collection_stats(session, player_ids=None):
+    query = session.query(
+        PokemonOwned.player_id, PokemonOwned.pokedex_number, func.count()
+    ).group_by(PokemonOwned.player_id, PokemonOwned.pokedex_number)
+
+    clear = delete(PlayerCollectionStats)
+    if player_ids:
+        query = query.filter(PokemonOwned.player_id.in_(player_ids))
+        clear = clear.where(PlayerCollectionStats.player_id.in_(player_ids))
+
+    counts = {}
+    for player_id, pokedex_number, amount in query.yield_per(REBUILD_BATCH):
+        counts.setdefault(player_id, Counter())[pokedex_number] = amount
+
+    rows = [stats_row(player_id, species) for player_id, species in counts.items()]
+
+    session.execute(clear)
+    for start in range(0, len(rows), REBUILD_BATCH):
+        session.execute(
+            insert(PlayerCollectionStats).values(rows[start : start + REBUILD_BATCH])
+        )
+
+    return len(rows)
@@ -0,0 +1,78 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import case
+
+from helpers.cache_invalidation import on_invalidate
+from models.models import t_friend
+
+MAX_CACHED_PLAYERS = int(os.getenv("FRIEND_GRAPH_SIZE", "10000"))
+FRIEND_GRAPH_TTL_SECONDS = float(os.getenv("FRIEND_GRAPH_TTL_SECONDS", "60"))
+
+# Índice local de amistades aprobadas: player_id -> (expira, frozenset de
+# amigos), con desalojo LRU. Se invalida al aceptar, rechazar o borrar una
+# amistad, aquí y en los demás workers (helpers.cache_invalidation); el TTL
+# acota cuánto puede vivir una entrada si se pierde una invalidación.
+_friends = OrderedDict()
+_lock = threading.Lock()
+_generation = 0
+
+
+def load_friend_ids(session, player_id):
+    friend_id = case(
+        (t_friend.c.id1 == player_id, t_friend.c.id2), else_=t_friend.c.id1
+    )
+    rows = (
+        session.query(friend_id)
+        .filter(
+            (t_friend.c.id1 == player_id) | (t_friend.c.id2 == player_id),
+            t_friend.c.approved.is_(True),
+        )
+        .all()
+    )
+    return frozenset(row[0] for row in rows)
+
+
+def get_friend_ids(session, player_id):
+    with _lock:
+        cached = _friends.get(player_id)
+        if cached is not None:
+            expires, friend_ids = cached
+            if expires > time.monotonic():
+                _friends.move_to_end(player_id)
+                return friend_ids
+            del _friends[player_id]
+        generation = _generation
+
+    friend_ids = load_friend_ids(session, player_id)
+
+    with _lock:
+        # Si hubo una invalidación mientras se leía, no guardar datos viejos
+        if generation == _generation:
+            _friends[player_id] = (
+                time.monotonic() + FRIEND_GRAPH_TTL_SECONDS,
+                friend_ids,
+            )
+            _friends.move_to_end(player_id)
+            while len(_friends) > MAX_CACHED_PLAYERS:
+                _friends.popitem(last=False)
+
+    return friend_ids
+
+
+def are_friends(session, player_id, other_id):
+    return other_id in get_friend_ids(session, player_id)
+
+
+def invalidate_friends(*player_ids):
+    global _generation
+
+    with _lock:
+        _generation += 1
+        for player_id in player_ids:
+            _friends.pop(player_id, None)
+
+
+on_invalidate(invalidate_friends)
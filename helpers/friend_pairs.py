@@ -0,0 +1,21 @@
+from sqlalchemy import and_
+
+from models.models import t_friend
+
+
+def canonical_pair(player_id, other_id):
+    return (player_id, other_id) if player_id <= other_id else (other_id, player_id)
+
+
+# Busca la fila de la pareja por el índice único (id_min, id_max). Se usa IN
+# con los dos valores en cada columna en vez de igualdad con el par de Python
+# porque LEAST/GREATEST comparan con la collation de la columna (los IDs
+# viejos mezclan mayúsculas y minúsculas) y min()/max() de Python no; sigue
+# siendo un rango de a lo más cuatro llaves sobre el mismo índice.
+def pair_filter(player_id, other_id):
+    pair = canonical_pair(player_id, other_id)
+    return and_(
+        t_friend.c.id_min.in_(pair),
+        t_friend.c.id_max.in_(pair),
+        t_friend.c.id_min != t_friend.c.id_max,
+    )
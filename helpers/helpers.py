@@ -1,14 +1,9 @@
 import random
-import string
+import threading
+import time
+from collections import OrderedDict
 
-
-def create_id(length):
-    # combinación de letras y dígitos
-    characters = string.ascii_letters + string.digits
-
-    random_string = "".join(random.choice(characters) for _ in range(length))
-
-    return random_string
+from models.models import Player
 
 
 def choose_capture_rate(capture_rates):
@@ -17,3 +12,108 @@ def choose_capture_rate(capture_rates):
         tickets.extend([key] * value)
 
     return random.choice(tickets)
+
+
+class AliasSampler:
+    # Vose's alias method with integer tables, so every draw is O(1) and the
+    # odds are exact (no float rounding between weights).
+    __slots__ = ("items", "prob", "alias", "total")
+
+    def __init__(self, items, weights):
+        n = len(items)
+        total = sum(weights)
+
+        self.items = tuple(items)
+        self.total = total
+        self.prob = [total] * n
+        self.alias = list(range(n))
+
+        scaled = [w * n for w in weights]
+        small = [i for i, s in enumerate(scaled) if s < total]
+        large = [i for i, s in enumerate(scaled) if s >= total]
+
+        while small and large:
+            less = small.pop()
+            more = large.pop()
+
+            self.prob[less] = scaled[less]
+            self.alias[less] = more
+
+            scaled[more] -= total - scaled[less]
+            if scaled[more] < total:
+                small.append(more)
+            else:
+                large.append(more)
+
+    def __len__(self):
+        return len(self.items)
+
+    def draw(self):
+        if not self.items:
+            raise ValueError("Problem")
+
+        i = random.randrange(len(self.items))
+        prob = self.prob[i]
+        if prob == self.total or random.randrange(self.total) < prob:
+            return self.items[i]
+        return self.items[self.alias[i]]
+
+    def draw_many(self, count):
+        return [self.draw() for _ in range(count)]
+
+
+def capture_weights(rows):
+    # Same odds as choose_capture_rate + random.choice: a rate with n_r species
+    # wins with probability n_r / N, then each of its species with 1 / n_r, so
+    # every species with a capture rate ends up with exactly 1 / N. Species
+    # with a NULL rate get no tickets.
+    items = [
+        (row.pokedex_number, row.name) for row in rows if row.capture_rate is not None
+    ]
+    return items, [1] * len(items)
+
+
+# 1062 = ER_DUP_ENTRY en MySQL; el texto cubre otros drivers
+def is_duplicate_key(error):
+    orig = getattr(error, "orig", error)
+    code = orig.args[0] if getattr(orig, "args", None) else None
+    message = str(orig).lower()
+    return code == 1062 or "duplicate" in message or "unique constraint" in message
+
+
+# Nombre actual desde la BD para los avisos: el claim "user" del JWT se queda
+# con el nombre del login aunque el jugador lo cambie
+def player_username(session, player_id):
+    return session.query(Player.username).filter(Player.id == player_id).scalar()
+
+
+# Caché en memoria con expiración y tamaño máximo (desaloja el más viejo)
+class TTLCache:
+    def __init__(self, ttl, max_size):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def pop(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
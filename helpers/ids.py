@@ -0,0 +1,54 @@
+import secrets
+import threading
+import time
+
+# Crockford base32: ordena igual en collations binarias y case-insensitive
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+
+TIME_LENGTH = 10  # 48 bits de milisegundos, alcanza hasta el año 10889
+MIN_LENGTH = 20
+DEFAULT_LENGTH = 26  # mismo tamaño que un ULID
+
+_lock = threading.Lock()
+_last = {}  # length -> (milliseconds, random part)
+
+
+def _encode(value, length):
+    chars = []
+    for _ in range(length):
+        value, index = divmod(value, 32)
+        chars.append(ALPHABET[index])
+    return "".join(reversed(chars))
+
+
+def _next(length, now_ms):
+    random_bits = 5 * (length - TIME_LENGTH)
+    last_ms, last_random = _last.get(length, (-1, 0))
+
+    # Mismo milisegundo (o reloj hacia atrás): seguir contando desde el último
+    # valor para que los IDs del proceso nunca dejen de crecer
+    if now_ms <= last_ms:
+        now_ms = last_ms
+        random_part = last_random + 1
+        if random_part >> random_bits:
+            now_ms += 1
+            random_part = secrets.randbits(random_bits - 1)
+    else:
+        # Un bit libre para que los incrementos no desborden
+        random_part = secrets.randbits(random_bits - 1)
+
+    _last[length] = (now_ms, random_part)
+    return _encode(now_ms, TIME_LENGTH) + _encode(random_part, length - TIME_LENGTH)
+
+
+def generate(n, length=DEFAULT_LENGTH):
+    if length < MIN_LENGTH:
+        raise ValueError(f"IDs need at least {MIN_LENGTH} characters")
+
+    now_ms = time.time_ns() // 1_000_000
+    with _lock:
+        return [_next(length, now_ms) for _ in range(n)]
+
+
+def new_id(length=DEFAULT_LENGTH):
+    return generate(1, length)[0]
@@ -0,0 +1,54 @@
+import os
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+MIGRATIONS_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations"
+)
+
+# Errores de MySQL que significan "ya estaba aplicado": columna o índice
+# duplicado, o índice que ya no existe
+ALREADY_APPLIED = {1060, 1061, 1091}
+
+
+def migration_files():
+    return sorted(
+        os.path.join(MIGRATIONS_DIR, name)
+        for name in os.listdir(MIGRATIONS_DIR)
+        if name.endswith(".sql")
+    )
+
+
+def split_statements(sql):
+    lines = [line for line in sql.splitlines() if not line.strip().startswith("--")]
+    return [
+        statement.strip()
+        for statement in "\n".join(lines).split(";")
+        if statement.strip()
+    ]
+
+
+# Corre cada sentencia por separado (en MySQL el DDL no es transaccional) y
+# salta las que ya estaban aplicadas. Regresa [(archivo, aplicadas, saltadas)]
+def apply_migrations(engine):
+    results = []
+    for path in migration_files():
+        with open(path, encoding="utf-8") as migration:
+            statements = split_statements(migration.read())
+
+        applied = skipped = 0
+        for statement in statements:
+            try:
+                with engine.begin() as connection:
+                    connection.execute(text(statement))
+                applied += 1
+            except OperationalError as e:
+                code = e.orig.args[0] if getattr(e.orig, "args", None) else None
+                if code not in ALREADY_APPLIED:
+                    raise
+                skipped += 1
+
+        results.append((os.path.basename(path), applied, skipped))
+
+    return results
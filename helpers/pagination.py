@@ -0,0 +1,56 @@
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+def encode_cursor(moment, row_id):
+    raw = json.dumps([moment.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        moment, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(moment), str(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+# Devuelve (limit, after) o None si el cliente no pidió paginación
+def page_args(args):
+    if "limit" not in args and "after" not in args:
+        return None
+
+    try:
+        limit = int(args.get("limit", DEFAULT_LIMIT))
+    except ValueError:
+        raise ValueError("limit must be an integer")
+
+    if limit < 1 or limit > MAX_LIMIT:
+        raise ValueError(f"limit must be between 1 and {MAX_LIMIT}")
+
+    after = args.get("after")
+    return limit, decode_cursor(after) if after else None
+
+
+# Filas estrictamente después del cursor en orden (time DESC, id DESC).
+# Expandido en OR en vez de tuple_() para que MySQL lo use como rango del índice
+def keyset_before(time_column, id_column, after):
+    moment, row_id = after
+    return or_(
+        time_column < moment,
+        and_(time_column == moment, id_column < row_id),
+    )
+
+
+def next_cursor(rows, limit, moment_of, id_of):
+    if len(rows) <= limit:
+        return None
+    last = rows[limit - 1]
+    return encode_cursor(moment_of(last), id_of(last))
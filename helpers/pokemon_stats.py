@@ -0,0 +1,103 @@
+import threading
+from collections import namedtuple
+from types import MappingProxyType
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from config.db import SessionLocal
+from models.models import PokemonStat
+
+# Copia inmutable de una fila de pokemon_stat
+PokemonStatEntry = namedtuple(
+    "PokemonStatEntry",
+    [
+        "pokedex_number",
+        "name",
+        "type1",
+        "type2",
+        "classification",
+        "base_total",
+        "generation",
+        "capture_rate",
+        "is_legendary",
+    ],
+)
+
+_stats = None
+_stats_lock = threading.Lock()
+
+
+def load_pokemon_stats():
+    session = SessionLocal()
+    try:
+        rows = session.query(
+            *(getattr(PokemonStat, field) for field in PokemonStatEntry._fields)
+        ).all()
+    finally:
+        session.close()
+
+    return MappingProxyType(
+        {row.pokedex_number: PokemonStatEntry(*row) for row in rows}
+    )
+
+
+# Hook explícito para cuando se vuelve a sembrar la tabla
+def reload_pokemon_stats():
+    global _stats
+
+    stats = load_pokemon_stats()
+    with _stats_lock:
+        _stats = stats
+
+    return stats
+
+
+def invalidate_pokemon_stats():
+    global _stats
+
+    with _stats_lock:
+        _stats = None
+
+
+def get_pokemon_stats():
+    global _stats
+
+    # Una tabla vacía se vuelve a consultar hasta que alguien la siembre
+    stats = _stats
+    if not stats:
+        with _stats_lock:
+            if not _stats:
+                _stats = load_pokemon_stats()
+            stats = _stats
+
+    return stats
+
+
+# Read-through: un número desconocido significa que la tabla cambió por fuera
+# de este proceso, así que se recarga una vez antes de rendirse
+def get_pokemon_stat(pokedex_number):
+    entry = get_pokemon_stats().get(pokedex_number)
+    if entry is None:
+        entry = reload_pokemon_stats().get(pokedex_number)
+
+    return entry
+
+
+# Recargar solo después de un commit que tocó pokemon_stat desde el ORM
+@event.listens_for(Session, "after_flush")
+def _track_pokemon_stat_changes(session, flush_context):
+    changed = session.new | session.dirty | session.deleted
+    if any(isinstance(obj, PokemonStat) for obj in changed):
+        session.info["pokemon_stat_changed"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    if session.info.pop("pokemon_stat_changed", False):
+        invalidate_pokemon_stats()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_after_rollback(session):
+    session.info.pop("pokemon_stat_changed", None)
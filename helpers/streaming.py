@@ -0,0 +1,36 @@
+from itertools import chain
+
+from flask import Response, current_app, stream_with_context
+
+STREAM_BATCH = 500  # filas por fetch al cursor del servidor y por chunk HTTP
+
+
+def wants_stream(args):
+    return args.get("stream", "").lower() in ("1", "true")
+
+
+# Escribe un arreglo JSON fila por fila desde un iterador (query.yield_per),
+# así la memoria por petición no crece con el tamaño de la colección.
+# first es la fila que ya se leyó para saber si había resultados; la sesión se
+# cierra cuando termina la respuesta, no al salir de la vista.
+def stream_json_array(first, rows, serialize, session):
+    dumps = current_app.json.dumps
+
+    def generate():
+        try:
+            yield "["
+            separator = ""
+            chunk = []
+            for row in chain([first], rows):
+                chunk.append(dumps(serialize(row)))
+                if len(chunk) == STREAM_BATCH:
+                    yield separator + ",".join(chunk)
+                    separator = ","
+                    chunk = []
+            if chunk:
+                yield separator + ",".join(chunk)
+            yield "]"
+        finally:
+            session.close()
+
+    return Response(stream_with_context(generate()), mimetype="application/json")
@@ -0,0 +1,116 @@
+import os
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
+from config.db import SessionLocal
+from extensions import socketio
+from helpers.trade_locks import release_trade_locks
+from helpers.versioning import bump_versions
+from models.models import Trade, TradeStatus
+
+TRADE_TTL_HOURS = float(os.getenv("TRADE_TTL_HOURS", "72"))
+TRADE_SWEEP_INTERVAL_SECONDS = float(os.getenv("TRADE_SWEEP_INTERVAL_SECONDS", "300"))
+TRADE_SWEEP_BATCH = int(os.getenv("TRADE_SWEEP_BATCH", "500"))
+TRADE_SWEEPER_ENABLED = os.getenv("TRADE_SWEEPER_ENABLED", "1") == "1"
+
+sweep_metrics = {
+    "runs": 0,
+    "batches": 0,
+    "total_expired": 0,
+    "last_started_at": None,
+    "last_duration_ms": None,
+    "last_expired": 0,
+    "last_error": None,
+}
+
+_started = False
+
+
+# Expira un lote acotado en su propia transacción. SKIP LOCKED deja pasar
+# los trades que alguien está confirmando en este momento.
+def expire_batch(session, cutoff, limit=TRADE_SWEEP_BATCH):
+    stale = (
+        session.query(Trade.id, Trade.requester_id, Trade.receiver_id)
+        .filter(Trade.status == TradeStatus.pending, Trade.created_at < cutoff)
+        .order_by(Trade.created_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    if not stale:
+        return 0, 0
+
+    trade_ids = [row.id for row in stale]
+    expired = session.execute(
+        update(Trade)
+        .where(Trade.id.in_(trade_ids), Trade.status == TradeStatus.pending)
+        .values(status=TradeStatus.expired, decided_at=datetime.now())
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+    release_trade_locks(session, *trade_ids)
+    bump_versions(
+        session,
+        *{pid for row in stale for pid in (row.requester_id, row.receiver_id)},
+    )
+    return len(stale), expired
+
+
+def sweep_expired_trades(ttl_hours=TRADE_TTL_HOURS, batch=TRADE_SWEEP_BATCH):
+    started = time.perf_counter()
+    sweep_metrics["last_started_at"] = datetime.now().isoformat()
+    cutoff = datetime.now() - timedelta(hours=ttl_hours)
+
+    total = 0
+    try:
+        while True:
+            session = SessionLocal()
+            try:
+                selected, expired = expire_batch(session, cutoff, batch)
+                session.commit()
+            except Exception:
+                session.rollback()
+                raise
+            finally:
+                session.close()
+
+            total += expired
+            sweep_metrics["batches"] += 1
+            if selected < batch:
+                break
+
+            # Cede el turno a las peticiones entre lotes
+            socketio.sleep(0)
+
+        sweep_metrics["last_error"] = None
+    except Exception as e:
+        sweep_metrics["last_error"] = str(e)
+    finally:
+        sweep_metrics["runs"] += 1
+        sweep_metrics["last_expired"] = total
+        sweep_metrics["total_expired"] += total
+        sweep_metrics["last_duration_ms"] = round(
+            (time.perf_counter() - started) * 1000, 2
+        )
+
+    return total
+
+
+def run_trade_sweeper():
+    while True:
+        sweep_expired_trades()
+        socketio.sleep(TRADE_SWEEP_INTERVAL_SECONDS)
+
+
+# Una green thread por proceso; con varios workers el SKIP LOCKED y el UPDATE
+# condicionado a pending evitan que dos sweepers expiren lo mismo
+def start_trade_sweeper():
+    global _started
+
+    if _started or not TRADE_SWEEPER_ENABLED:
+        return
+
+    _started = True
+    socketio.start_background_task(run_trade_sweeper)
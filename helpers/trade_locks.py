@@ -0,0 +1,110 @@
+from sqlalchemy import delete, exists, insert
+
+from models.models import Trade, TradeItem, TradePokemonLock, TradeStatus
+
+REBUILD_BATCH = 1000
+
+
+# owners: {pokemon_id: player_id que lo ofrece}
+def add_trade_items(session, trade_id, owners):
+    session.execute(
+        insert(TradeItem).values(
+            [
+                {"trade_id": trade_id, "pokemon_id": pokemon_id, "player_id": player_id}
+                for pokemon_id, player_id in owners.items()
+            ]
+        )
+    )
+
+
+# Bloquea los Pokémon de un trade en un solo INSERT; si alguno ya está en
+# otro trade pendiente la llave primaria lo rechaza (IntegrityError)
+def lock_trade_pokemon(session, trade_id, owners):
+    session.execute(
+        insert(TradePokemonLock).values(
+            [
+                {"pokemon_id": pokemon_id, "trade_id": trade_id, "player_id": player_id}
+                for pokemon_id, player_id in owners.items()
+            ]
+        )
+    )
+
+
+def release_trade_locks(session, *trade_ids):
+    if not trade_ids:
+        return
+
+    session.execute(
+        delete(TradePokemonLock)
+        .where(TradePokemonLock.trade_id.in_(trade_ids))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def locked_pokemon_ids(session, pokemon_ids):
+    rows = session.query(TradePokemonLock.pokemon_id).filter(
+        TradePokemonLock.pokemon_id.in_(pokemon_ids)
+    )
+    return {row.pokemon_id for row in rows}
+
+
+def _insert_batches(session, table, rows):
+    for start in range(0, len(rows), REBUILD_BATCH):
+        session.execute(insert(table).values(rows[start : start + REBUILD_BATCH]))
+
+
+# Reconstruye la tabla desde los trades pendientes (backfill / reparación).
+# Antes crea los trade_item que falten de trades 1 a 1 viejos. Si dos trades
+# comparten Pokémon, se queda el más antiguo.
+def rebuild_trade_locks(session):
+    legacy = (
+        session.query(
+            Trade.id,
+            Trade.requester_id,
+            Trade.receiver_id,
+            Trade.requester_pokemon_id,
+            Trade.receiver_pokemon_id,
+        )
+        .filter(
+            Trade.status == TradeStatus.pending,
+            Trade.requester_pokemon_id.isnot(None),
+            ~exists().where(TradeItem.trade_id == Trade.id),
+        )
+        .all()
+    )
+    _insert_batches(
+        session,
+        TradeItem,
+        [
+            {"trade_id": trade.id, "pokemon_id": pokemon_id, "player_id": player_id}
+            for trade in legacy
+            for pokemon_id, player_id in (
+                (trade.requester_pokemon_id, trade.requester_id),
+                (trade.receiver_pokemon_id, trade.receiver_id),
+            )
+        ],
+    )
+
+    items = (
+        session.query(TradeItem.pokemon_id, TradeItem.trade_id, TradeItem.player_id)
+        .join(Trade, Trade.id == TradeItem.trade_id)
+        .filter(Trade.status == TradeStatus.pending)
+        .order_by(Trade.created_at, Trade.id)
+        .all()
+    )
+
+    rows = {}
+    for item in items:
+        rows.setdefault(
+            item.pokemon_id,
+            {
+                "pokemon_id": item.pokemon_id,
+                "trade_id": item.trade_id,
+                "player_id": item.player_id,
+            },
+        )
+
+    session.execute(delete(TradePokemonLock))
+    _insert_batches(session, TradePokemonLock, list(rows.values()))
+
+    return len(rows)
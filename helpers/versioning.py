@@ -0,0 +1,102 @@
+import hashlib
+import logging
+
+from flask import make_response, request
+from sqlalchemy import select, update
+
+from config.db import SessionLocal
+from helpers.friend_graph import get_friend_ids
+from models.models import Player, Trade, TradeStatus
+
+logger = logging.getLogger(__name__)
+
+
+# Cada cambio visible para un jugador sube su contador en la misma transacción
+def bump_versions(session, *player_ids):
+    ids = {player_id for player_id in player_ids if player_id}
+    if not ids:
+        return
+
+    session.execute(
+        update(Player)
+        .where(Player.id.in_(ids))
+        .values(version=Player.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def collection_version(session, player_id):
+    return session.query(Player.version).filter(Player.id == player_id).scalar()
+
+
+# ETag de las listas con datos de otros jugadores (amigos, trades pendientes):
+# una sola lectura por PK. Los cambios propios suben version y los de los
+# demás suben peer_version (bump_peer_versions)
+def view_version(session, player_id):
+    return tuple(
+        session.query(Player.version, Player.peer_version)
+        .filter(Player.id == player_id)
+        .one_or_none()
+        or ()
+    )
+
+
+# Después del commit y en su propia transacción: avisa a los amigos de
+# player_ids (y, con pending_trades, a quienes tienen un trade pendiente de
+# ellos) que cambió algo que muestran. Es un solo UPDATE que no se mezcla con
+# los candados de la transacción original, así dos amigos que capturan a la
+# vez no se bloquean entre sí. Si falla, la respuesta ya salió: solo se loguea
+def bump_peer_versions(player_ids, pending_trades=False):
+    player_ids = [player_id for player_id in player_ids if player_id]
+    if not player_ids:
+        return
+
+    session = SessionLocal()
+    try:
+        peers = set()
+        for player_id in player_ids:
+            peers.update(get_friend_ids(session, player_id))
+
+        if pending_trades:
+            peers.update(
+                session.scalars(
+                    select(Trade.receiver_id).where(
+                        Trade.requester_id.in_(player_ids),
+                        Trade.status == TradeStatus.pending,
+                    )
+                )
+            )
+
+        if peers:
+            session.execute(
+                update(Player)
+                .where(Player.id.in_(peers))
+                .values(peer_version=Player.peer_version + 1)
+                .execution_options(synchronize_session=False)
+            )
+            session.commit()
+    except Exception:
+        session.rollback()
+        logger.exception("Could not bump peer versions")
+    finally:
+        session.close()
+
+
+def make_etag(scope, player_id, version):
+    raw = f"{scope}:{player_id}:{version}:{request.query_string.decode()}"
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def is_not_modified(etag):
+    return request.if_none_match.contains(etag)
+
+
+def not_modified(etag):
+    response = make_response("", 304)
+    response.set_etag(etag)
+    return response
+
+
+def with_etag(response, etag):
+    response.set_etag(etag)
+    return response
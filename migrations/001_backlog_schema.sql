@@ -0,0 +1,33 @@
+-- Cambios sobre tablas que ya existen. create_all solo crea tablas nuevas
+-- (player_collection_stats, trade_item, trade_pokemon_lock,
+-- presence_session); esto agrega columnas, índices y enums a las viejas.
+-- Se aplica con `flask apply-migrations` (se puede correr más de una vez).
+
+-- Contador de versión para ETags
+ALTER TABLE player ADD COLUMN version INT NOT NULL DEFAULT 0;
+
+-- Pokeballs abiertas en el día de last_opened
+ALTER TABLE player ADD COLUMN opened_today INT NOT NULL DEFAULT 0;
+
+-- Páginas de la colección por (obtained_at, id); reemplaza fk_player
+CREATE INDEX ix_pokemon_owned_player_obtained
+    ON pokemon_owned (player_id, obtained_at, id);
+DROP INDEX fk_player ON pokemon_owned;
+
+-- Trades expirados por el sweeper
+ALTER TABLE trade MODIFY status
+    ENUM('pending','accepted','rejected','expired') NOT NULL;
+CREATE INDEX ix_trade_status_created ON trade (status, created_at);
+
+-- Historial y pendientes por jugador + status; reemplazan los índices simples
+CREATE INDEX ix_trade_requester_status_created
+    ON trade (requester_id, status, created_at);
+CREATE INDEX ix_trade_receiver_status_created
+    ON trade (receiver_id, status, created_at);
+DROP INDEX fk_trade_requester ON trade;
+DROP INDEX fk_trade_receiver ON trade;
+
+-- Paquetes: los Pokémon van en trade_item y estas columnas quedan NULL
+ALTER TABLE trade
+    MODIFY requester_pokemon_id VARCHAR(24) NULL,
+    MODIFY receiver_pokemon_id VARCHAR(24) NULL;
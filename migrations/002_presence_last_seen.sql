@@ -0,0 +1,6 @@
+-- Heartbeat del registro de presencia: las filas que ningún worker refresca
+-- dejan de contar como conectadas y se borran
+ALTER TABLE presence_session ADD COLUMN last_seen DATETIME NULL;
+UPDATE presence_session SET last_seen = connected_at WHERE last_seen IS NULL;
+ALTER TABLE presence_session MODIFY last_seen DATETIME NOT NULL;
+CREATE INDEX ix_presence_last_seen ON presence_session (last_seen);
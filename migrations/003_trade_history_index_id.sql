@@ -0,0 +1,10 @@
+-- El historial pagina por (created_at, id): con id en el índice cada
+-- (jugador, status) sale ya en ese orden y no hace falta filesort.
+-- DROP y ADD en el mismo ALTER para que las FK nunca se queden sin índice
+-- Volver a correrlo solo reconstruye los dos índices con las mismas columnas
+ALTER TABLE trade
+    DROP INDEX ix_trade_requester_status_created,
+    ADD INDEX ix_trade_requester_status_created (requester_id, status, created_at, id);
+ALTER TABLE trade
+    DROP INDEX ix_trade_receiver_status_created,
+    ADD INDEX ix_trade_receiver_status_created (receiver_id, status, created_at, id);
@@ -0,0 +1,2 @@
+-- ETag de amigos y trades pendientes en una sola lectura de player
+ALTER TABLE player ADD COLUMN peer_version INT NOT NULL DEFAULT 0;
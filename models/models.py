@@ -11,6 +11,7 @@ from sqlalchemy import (
     ForeignKeyConstraint,
     Index,
     Integer,
+    JSON,
     String,
     Table,
     text,
@@ -32,6 +33,18 @@ class Player(Base):
     email: Mapped[str] = mapped_column(String(50), nullable=False)
     password: Mapped[str] = mapped_column(String(200), nullable=False)
     last_opened: Mapped[Optional[datetime.date]] = mapped_column(Date)
+    # Pokeballs abiertas el día de last_opened
+    opened_today: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default=text("0")
+    )
+    version: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default=text("0")
+    )
+    # Sube cuando cambian datos de otros jugadores que este ve (amigos, quien
+    # le manda un trade); con version forma el ETag de esas listas
+    peer_version: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default=text("0")
+    )
 
     profile_picture: Mapped[str] = mapped_column(
         String(255), nullable=False, default="default.png"
@@ -135,7 +148,8 @@ class PokemonOwned(Base):
             onupdate="CASCADE",
             name="fk_pokemon",
         ),
-        Index("fk_player", "player_id"),
+        # Cubre fk_player y las páginas por (obtained_at, id) de cada jugador
+        Index("ix_pokemon_owned_player_obtained", "player_id", "obtained_at", "id"),
         Index("fk_pokemon", "pokedex_number"),
     )
 
@@ -152,10 +166,35 @@ class PokemonOwned(Base):
     )
 
 
+# Resumen de la colección de cada jugador, mantenido en la misma transacción
+# que captura, borra o intercambia (species guarda cuántos tiene de cada uno)
+class PlayerCollectionStats(Base):
+    __tablename__ = "player_collection_stats"
+    __table_args__ = (
+        ForeignKeyConstraint(
+            ["player_id"],
+            ["player.id"],
+            ondelete="CASCADE",
+            onupdate="CASCADE",
+            name="fk_collection_stats_player",
+        ),
+    )
+
+    player_id: Mapped[str] = mapped_column(String(32), primary_key=True)
+    total: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    unique_species: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    legendary: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    species: Mapped[dict] = mapped_column(JSON, nullable=False, default=dict)
+    by_type: Mapped[dict] = mapped_column(JSON, nullable=False, default=dict)
+    by_generation: Mapped[dict] = mapped_column(JSON, nullable=False, default=dict)
+    updated_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime)
+
+
 class TradeStatus(enum.Enum):
     pending = "pending"
     accepted = "accepted"
     rejected = "rejected"
+    expired = "expired"
 
 
 class Trade(Base):
@@ -175,15 +214,36 @@ class Trade(Base):
             ["pokemon_owned.id"],
             name="fk_trade_receiver_pokemon",
         ),
-        Index("fk_trade_requester", "requester_id"),
-        Index("fk_trade_receiver", "receiver_id"),
+        # Cubren las FK y los filtros por jugador + status ordenados por
+        # (created_at, id), el orden de las páginas del historial
+        Index(
+            "ix_trade_requester_status_created",
+            "requester_id",
+            "status",
+            "created_at",
+            "id",
+        ),
+        Index(
+            "ix_trade_receiver_status_created",
+            "receiver_id",
+            "status",
+            "created_at",
+            "id",
+        ),
+        # Para que el sweeper encuentre los pendientes viejos sin recorrer todo
+        Index("ix_trade_status_created", "status", "created_at"),
     )
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True)
     requester_id: Mapped[str] = mapped_column(String(32), nullable=False)
     receiver_id: Mapped[str] = mapped_column(String(32), nullable=False)
-    requester_pokemon_id: Mapped[str] = mapped_column(String(24), nullable=False)
-    receiver_pokemon_id: Mapped[str] = mapped_column(String(24), nullable=False)
+    # Solo en trades 1 a 1; los paquetes guardan sus Pokémon en trade_item
+    requester_pokemon_id: Mapped[Optional[str]] = mapped_column(
+        String(24), nullable=True
+    )
+    receiver_pokemon_id: Mapped[Optional[str]] = mapped_column(
+        String(24), nullable=True
+    )
     status: Mapped[TradeStatus] = mapped_column(
         Enum(TradeStatus), default=TradeStatus.pending, nullable=False
     )
@@ -201,3 +261,77 @@ class Trade(Base):
     receiver_pokemon: Mapped["PokemonOwned"] = relationship(
         "PokemonOwned", foreign_keys=[receiver_pokemon_id]
     )
+
+
+# Pokémon incluidos en un trade (1 o más por lado); player_id es quien lo ofrece
+class TradeItem(Base):
+    __tablename__ = "trade_item"
+    __table_args__ = (
+        ForeignKeyConstraint(
+            ["trade_id"],
+            ["trade.id"],
+            ondelete="CASCADE",
+            name="fk_trade_item_trade",
+        ),
+        ForeignKeyConstraint(
+            ["pokemon_id"], ["pokemon_owned.id"], name="fk_trade_item_pokemon"
+        ),
+        Index("ix_trade_item_pokemon", "pokemon_id"),
+    )
+
+    trade_id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    pokemon_id: Mapped[str] = mapped_column(String(24), primary_key=True)
+    player_id: Mapped[str] = mapped_column(String(32), nullable=False)
+
+
+# Un Pokémon solo puede estar en un intercambio pendiente a la vez: la llave
+# primaria es el Pokémon y la fila vive mientras el trade está pendiente
+class TradePokemonLock(Base):
+    __tablename__ = "trade_pokemon_lock"
+    __table_args__ = (
+        ForeignKeyConstraint(
+            ["pokemon_id"], ["pokemon_owned.id"], name="fk_trade_lock_pokemon"
+        ),
+        ForeignKeyConstraint(
+            ["trade_id"],
+            ["trade.id"],
+            ondelete="CASCADE",
+            name="fk_trade_lock_trade",
+        ),
+        Index("ix_trade_lock_trade", "trade_id"),
+        Index("ix_trade_lock_player", "player_id"),
+    )
+
+    pokemon_id: Mapped[str] = mapped_column(String(24), primary_key=True)
+    trade_id: Mapped[str] = mapped_column(String(36), nullable=False)
+    # Dueño del Pokémon cuando se creó el trade
+    player_id: Mapped[str] = mapped_column(String(32), nullable=False)
+
+
+# Sockets abiertos de todos los procesos (backend "sql" del registro de
+# presencia); worker identifica al proceso que tiene el socket y last_seen es
+# su último heartbeat, para descartar las filas de workers que murieron
+class PresenceSession(Base):
+    __tablename__ = "presence_session"
+    __table_args__ = (
+        Index("ix_presence_user", "user_id"),
+        Index("ix_presence_worker", "worker"),
+        Index("ix_presence_last_seen", "last_seen"),
+    )
+
+    sid: Mapped[str] = mapped_column(String(64), primary_key=True)
+    user_id: Mapped[str] = mapped_column(String(32), nullable=False)
+    worker: Mapped[str] = mapped_column(String(100), nullable=False)
+    connected_at: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=False)
+    last_seen: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=False)
+
+
+# Amistades que cambiaron, para que los demás workers tiren sus cachés en
+# memoria (friend_graph y sugerencias) de esos jugadores
+class CacheInvalidation(Base):
+    __tablename__ = "cache_invalidation"
+    __table_args__ = (Index("ix_cache_invalidation_created", "created_at"),)
+
+    id: Mapped[str] = mapped_column(String(26), primary_key=True)
+    player_id: Mapped[str] = mapped_column(String(32), nullable=False)
+    created_at: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=False)
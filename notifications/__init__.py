@@ -0,0 +1,95 @@
+import logging
+import os
+from collections import deque
+
+from events.presence import presence, user_room
+from extensions import socketio
+
+# Ventana para juntar ráfagas: todo lo que llegue a un mismo usuario dentro
+# de ella sale en un solo evento "notifications"
+NOTIFY_FLUSH_SECONDS = float(os.getenv("NOTIFY_FLUSH_SECONDS", "0.1"))
+MAX_PENDING_NOTIFICATIONS = int(os.getenv("MAX_PENDING_NOTIFICATIONS", "10000"))
+
+notification_metrics = {
+    "queued": 0,
+    "dropped": 0,
+    "offline": 0,
+    "emitted": 0,
+    "batched": 0,
+    "errors": 0,
+    "last_error": None,
+}
+
+logger = logging.getLogger(__name__)
+
+_queue = deque()
+_started = False
+
+
+# Lo único que hacen los handlers HTTP: encolar, sin tocar el socket
+def notify(user_id, event, data):
+    if len(_queue) >= MAX_PENDING_NOTIFICATIONS:
+        notification_metrics["dropped"] += 1
+        return
+
+    _queue.append((user_id, event, data))
+    notification_metrics["queued"] += 1
+
+
+def flush_notifications():
+    by_user = {}
+    while _queue:
+        user_id, event, data = _queue.popleft()
+        by_user.setdefault(user_id, []).append((event, data))
+
+    online = set(presence.online(by_user))
+    for user_id, pending in by_user.items():
+        # Sin conexión no se reintenta: el cliente lee el estado al conectarse
+        if user_id not in online:
+            notification_metrics["offline"] += len(pending)
+            continue
+
+        # A la room del usuario: la cola de mensajes la lleva al worker que
+        # tenga su socket
+        room = user_room(user_id)
+
+        if len(pending) == 1:
+            event, data = pending[0]
+            socketio.emit(event, data, room=room)
+        else:
+            socketio.emit(
+                "notifications",
+                [{"event": event, "data": data} for event, data in pending],
+                room=room,
+            )
+            notification_metrics["batched"] += 1
+
+        notification_metrics["emitted"] += len(pending)
+
+    return len(by_user)
+
+
+def run_notification_dispatcher():
+    while True:
+        socketio.sleep(NOTIFY_FLUSH_SECONDS)
+        if not _queue:
+            continue
+
+        # Un error (BD de presencia, cola de mensajes) no debe matar el hilo:
+        # se pierde ese lote y se sigue con el siguiente
+        try:
+            flush_notifications()
+        except Exception as e:
+            notification_metrics["errors"] += 1
+            notification_metrics["last_error"] = str(e)
+            logger.exception("Notification flush failed")
+
+
+def start_notification_dispatcher():
+    global _started
+
+    if _started:
+        return
+
+    _started = True
+    socketio.start_background_task(run_notification_dispatcher)
@@ -1,17 +1,82 @@
 from flask import Blueprint, jsonify, request
 from flask_bcrypt import Bcrypt
-from sqlalchemy import func, or_
-from helpers.helpers import choose_capture_rate, create_id
-from models.models import Player, PokemonOwned, PokemonStat
+from sqlalchemy import case, insert, or_, update
+from helpers.capture_sampler import get_capture_sampler
+from helpers.collection_stats import apply_collection_delta
+from helpers.ids import generate, new_id
+from helpers.versioning import bump_peer_versions, bump_versions
+from models.models import Player, PokeballHistory, PokemonOwned
 from config.db import SessionLocal
 from flask_jwt_extended import jwt_required, get_jwt_identity
-import random
 from datetime import datetime
+import os
 
 capture_pokemon = Blueprint("capture_pokemon", __name__)
 
 bcrypt = Bcrypt()
 
+# Cada captura gasta una pokeball del día, así que un lote nunca puede pasar
+# de DAILY_POKEBALLS. Sin MAX_BATCH_CAPTURE el lote máximo es el día completo
+# (hasta 10); un MAX_BATCH_CAPTURE mayor que DAILY_POKEBALLS es un error de
+# configuración y no deja arrancar la app.
+DAILY_POKEBALLS = int(os.getenv("DAILY_POKEBALLS", "1"))
+MAX_BATCH_CAPTURE = int(os.getenv("MAX_BATCH_CAPTURE", str(min(10, DAILY_POKEBALLS))))
+
+if MAX_BATCH_CAPTURE > DAILY_POKEBALLS:
+    raise ValueError(
+        f"MAX_BATCH_CAPTURE ({MAX_BATCH_CAPTURE}) cannot be greater than "
+        f"DAILY_POKEBALLS ({DAILY_POKEBALLS}): each capture spends a daily pokeball"
+    )
+
+
+# Gasta `count` pokeballs del día con un solo UPDATE condicional: cada
+# pokeball es una captura y dos peticiones simultáneas no pueden pasarse del
+# límite diario. opened_today va primero porque MySQL asigna en orden y
+# necesita ver el last_opened anterior.
+def open_daily_pokeballs(session, player_id, today, count=1):
+    new_day = or_(Player.last_opened.is_(None), Player.last_opened < today)
+    result = session.execute(
+        update(Player)
+        .where(
+            Player.id == player_id,
+            or_(new_day, Player.opened_today + count <= DAILY_POKEBALLS),
+        )
+        .ordered_values(
+            (
+                Player.opened_today,
+                case((new_day, count), else_=Player.opened_today + count),
+            ),
+            (Player.last_opened, today),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def pokeballs_left(session, player_id, today):
+    last_opened, opened_today = (
+        session.query(Player.last_opened, Player.opened_today)
+        .filter(Player.id == player_id)
+        .one()
+    )
+    if last_opened is None or last_opened < today:
+        return DAILY_POKEBALLS
+    return max(DAILY_POKEBALLS - opened_today, 0)
+
+
+def pokeball_history_rows(player_id, pokedex_numbers, today):
+    return [
+        {
+            "id": history_id,
+            "user_id": player_id,
+            "awarded_pokemon_number": pokedex_number,
+            "opened_at": today,
+        }
+        for history_id, pokedex_number in zip(
+            generate(len(pokedex_numbers)), pokedex_numbers
+        )
+    ]
+
 
 # Capturar Pokemon aleatorio
 @capture_pokemon.route("/capture_pokemon", methods=["GET"])
@@ -20,70 +85,140 @@ def get_a_pokemon():
     try:
         player_id = get_jwt_identity()
         session = SessionLocal()
+        now = datetime.now()
 
-        # Esto es para lo de verificar si ya hizo un lanzamiento antes de las horas
-        # session.query(Player.last_opened).filter(Player.id == player_id).first()
-
-        capture_rates = (
-            session.query(
-                PokemonStat.capture_rate, func.count(PokemonStat.capture_rate)
-            )
-            .group_by(PokemonStat.capture_rate)
-            .order_by(func.count(PokemonStat.capture_rate))
-        ).all()
-
-        if not capture_rates:
-            raise ValueError("Problem")
-
-        choosen = choose_capture_rate(dict(capture_rates))
-
-        print("CAPTURE RATE ELEGIDO: " + str(choosen))
-
-        pokemon_list = (
-            session.query(PokemonStat.pokedex_number)
-            .filter(PokemonStat.capture_rate == choosen)
-            .all()
-        )
-
-        print(pokemon_list)
-        pokedex_numbers = []
-        for pokemon_tuple in pokemon_list:
-            pokedex_numbers.append(pokemon_tuple[0])
-
-        final_pokedex_number = random.choice(pokedex_numbers)
+        if not open_daily_pokeballs(session, player_id, now.date()):
+            session.rollback()
+            return jsonify({"message": "You already opened today's pokeball"}), 429
 
-        final_pokemon = (
-            session.query(PokemonStat)
-            .filter(PokemonStat.pokedex_number == final_pokedex_number)
-            .first()
-        )
+        final_pokedex_number, final_name = get_capture_sampler().draw()
 
-        owned_pokemon_id = create_id(24)
-        message = f"You've captured {final_pokemon.name}"
+        owned_pokemon_id = new_id(24)
+        message = f"You've captured {final_name}"
 
         owned_pokemon_data = PokemonOwned(
             id=owned_pokemon_id,
             player_id=player_id,
             pokedex_number=final_pokedex_number,
-            obtained_at=datetime.now(),
+            obtained_at=now,
             in_team=False,
         )
 
         session.add(owned_pokemon_data)
+        apply_collection_delta(session, player_id, added=[final_pokedex_number])
+        bump_versions(session, player_id)
+        session.execute(
+            insert(PokeballHistory).values(
+                pokeball_history_rows(player_id, [final_pokedex_number], now.date())
+            )
+        )
         session.commit()
+        # La lista de amigos muestra la última captura
+        bump_peer_versions([player_id])
 
         return (
             jsonify(
                 {
                     "message": message,
                     "pokedex_number": final_pokedex_number,
-                    "name": final_pokemon.name,
+                    "name": final_name,
                 }
             ),
             201,
         )
 
     except Exception as e:
+        session.rollback()
+        return jsonify({"message": str(e)}), 500
+
+    finally:
+        session.close()
+
+
+# Abrir varias pokeballs en una sola petición
+@capture_pokemon.route("/capture_pokemon/batch", methods=["POST"])
+@jwt_required()
+def get_many_pokemon():
+    data = request.get_json(silent=True) or {}
+    count = data.get("count")
+
+    if not isinstance(count, int) or isinstance(count, bool) or count < 1:
+        return jsonify({"message": "count must be a positive integer"}), 400
+
+    if count > MAX_BATCH_CAPTURE:
+        return (
+            jsonify({"message": f"count cannot be greater than {MAX_BATCH_CAPTURE}"}),
+            400,
+        )
+
+    session = SessionLocal()
+    try:
+        player_id = get_jwt_identity()
+        obtained_at = datetime.now()
+
+        # Cada captura del lote gasta una pokeball del día
+        if not open_daily_pokeballs(session, player_id, obtained_at.date(), count):
+            session.rollback()
+            left = pokeballs_left(session, player_id, obtained_at.date())
+            return (
+                jsonify(
+                    {
+                        "message": f"You only have {left} pokeballs left today",
+                        "pokeballs_left": left,
+                    }
+                ),
+                429,
+            )
+
+        captured = get_capture_sampler().draw_many(count)
+
+        owned_rows = []
+        captures_json = []
+        for owned_pokemon_id, (pokedex_number, name) in zip(
+            generate(count, 24), captured
+        ):
+            owned_rows.append(
+                {
+                    "id": owned_pokemon_id,
+                    "player_id": player_id,
+                    "pokedex_number": pokedex_number,
+                    "obtained_at": obtained_at,
+                    "in_team": False,
+                }
+            )
+            captures_json.append(
+                {
+                    "id": owned_pokemon_id,
+                    "message": f"You've captured {name}",
+                    "pokedex_number": pokedex_number,
+                    "name": name,
+                }
+            )
+
+        # Un solo INSERT con todas las filas
+        session.execute(insert(PokemonOwned).values(owned_rows))
+        apply_collection_delta(
+            session,
+            player_id,
+            added=[pokedex_number for pokedex_number, _ in captured],
+        )
+        bump_versions(session, player_id)
+        session.execute(
+            insert(PokeballHistory).values(
+                pokeball_history_rows(
+                    player_id,
+                    [pokedex_number for pokedex_number, _ in captured],
+                    obtained_at.date(),
+                )
+            )
+        )
+        session.commit()
+        bump_peer_versions([player_id])
+
+        return jsonify(captures_json), 201
+
+    except Exception as e:
+        session.rollback()
         return jsonify({"message": str(e)}), 500
 
     finally:
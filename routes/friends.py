@@ -1,11 +1,35 @@
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import get_jwt_identity, jwt_required
-from sqlalchemy import delete, insert
-from models.models import Player, PokemonOwned, PokemonStat, t_friend
+import os
+from sqlalchemy import delete, func, insert, select, union, union_all
+from sqlalchemy.exc import IntegrityError
+from models.models import Player, PokemonOwned, t_friend
 from config.db import SessionLocal
+from events import online_friend_ids
+from events.presence import presence
+from helpers.cache_invalidation import on_invalidate, publish_invalidation
+from helpers.friend_graph import get_friend_ids, invalidate_friends
+from helpers.friend_pairs import pair_filter
+from helpers.helpers import TTLCache, is_duplicate_key, player_username
+from helpers.pokemon_stats import get_pokemon_stat
+from helpers.versioning import (
+    bump_versions,
+    is_not_modified,
+    make_etag,
+    not_modified,
+    view_version,
+    with_etag,
+)
+from notifications import notify
 
 friends = Blueprint("friends", __name__)
 
+MAX_SUGGESTIONS = 50
+suggestions_cache = TTLCache(
+    ttl=int(os.getenv("FRIEND_SUGGESTIONS_TTL", "300")), max_size=10000
+)
+on_invalidate(suggestions_cache.pop)
+
 
 # CHECAR SOLICITUDES
 @friends.route("/friends/check_requests", methods=["GET"])
@@ -65,25 +89,8 @@ def send_request():
         if sender_id == receiver_id:
             return jsonify({"message": "No puedes agregarte a ti mismo"}), 400
 
-        # verificar que exista el otro jugador
-        receiver_player_data = (
-            session.query(Player).filter(Player.id == receiver_id).first()
-        )
-        if not receiver_player_data:
-            raise ValueError("That Player does not exist")
-
-        # evitar duplicados (opcional pero recomendable)
-        existing = (
-            session.query(t_friend)
-            .filter(
-                ((t_friend.c.id1 == sender_id) & (t_friend.c.id2 == receiver_id))
-                | ((t_friend.c.id1 == receiver_id) & (t_friend.c.id2 == sender_id))
-            )
-            .first()
-        )
-        if existing:
-            return jsonify({"message": "Friendship or request already exists"}), 400
-
+        # Un solo INSERT: el índice único (id_min, id_max) rechaza duplicados en
+        # cualquier dirección y la FK rechaza jugadores que no existen
         query = insert(t_friend).values(
             id1=sender_id,
             id2=receiver_id,
@@ -92,10 +99,26 @@ def send_request():
         )
 
         session.execute(query)
+        bump_versions(session, sender_id, receiver_id)
+        publish_invalidation(session, sender_id, receiver_id)
+        username = player_username(session, sender_id)
         session.commit()
+        suggestions_cache.pop(sender_id, receiver_id)
+
+        notify(
+            receiver_id,
+            "friend_request",
+            {"from_user_id": sender_id, "from_username": username},
+        )
 
         return jsonify({"message": f"Sent friend request to {receiver_id}"}), 200
 
+    except IntegrityError as e:
+        session.rollback()
+        if is_duplicate_key(e):
+            return jsonify({"message": "Friendship or request already exists"}), 400
+        return jsonify({"message": "That Player does not exist"}), 500
+
     except Exception as e:
         session.rollback()
         return jsonify({"message": str(e)}), 500
@@ -117,32 +140,38 @@ def accept_request():
         if not friend_id:
             return jsonify({"message": "friend_id is required"}), 400
 
-        request_entry = (
-            session.query(t_friend)
-            .filter(
-                ((t_friend.c.id1 == player_id) & (t_friend.c.id2 == friend_id))
-                | ((t_friend.c.id1 == friend_id) & (t_friend.c.id2 == player_id)),
+        # El número de filas actualizadas dice si había solicitud pendiente
+        result = session.execute(
+            t_friend.update()
+            .where(
+                pair_filter(player_id, friend_id),
                 t_friend.c.approved.is_(False),  # <--- antes 0
             )
-            .first()
+            .values(approved=True)  # <--- antes 1
         )
 
-        if not request_entry:
+        if result.rowcount == 0:
+            session.rollback()
             return jsonify({"message": "No pending request found"}), 404
 
-        session.execute(
-            t_friend.update()
-            .where(
-                ((t_friend.c.id1 == player_id) & (t_friend.c.id2 == friend_id))
-                | ((t_friend.c.id1 == friend_id) & (t_friend.c.id2 == player_id))
-            )
-            .values(approved=True)  # <--- antes 1
-        )
+        bump_versions(session, player_id, friend_id)
+        publish_invalidation(session, player_id, friend_id)
 
+        username = player_username(session, player_id)
         session.commit()
+        invalidate_friends(player_id, friend_id)
+        suggestions_cache.pop(player_id, friend_id)
 
-        friend_player = session.query(Player).filter(Player.id == friend_id).first()
-        friend_name = friend_player.username if friend_player else friend_id
+        notify(
+            friend_id,
+            "friend_request_accepted",
+            {"user_id": player_id, "username": username},
+        )
+
+        friend_name = (
+            session.query(Player.username).filter(Player.id == friend_id).scalar()
+            or friend_id
+        )
 
         return jsonify({"message": f"Friend request with {friend_name} accepted"}), 200
 
@@ -169,15 +198,16 @@ def deny_requests():
 
         session.execute(
             delete(t_friend).where(
-                (
-                    ((t_friend.c.id1 == player_id) & (t_friend.c.id2 == friend_id))
-                    | ((t_friend.c.id1 == friend_id) & (t_friend.c.id2 == player_id))
-                )
-                & t_friend.c.approved.is_(False)  # <--- antes 0
+                pair_filter(player_id, friend_id),
+                t_friend.c.approved.is_(False),  # <--- antes 0
             )
         )
+        bump_versions(session, player_id, friend_id)
+        publish_invalidation(session, player_id, friend_id)
 
         session.commit()
+        invalidate_friends(player_id, friend_id)
+        suggestions_cache.pop(player_id, friend_id)
 
         return jsonify({"message": f"Friend request denied"}), 200
 
@@ -197,45 +227,60 @@ def list_friends():
     try:
         player_id = get_jwt_identity()
 
-        friend_entries = (
-            session.query(t_friend)
-            .filter(
-                (t_friend.c.id1 == player_id) | (t_friend.c.id2 == player_id),
-                t_friend.c.approved.is_(True),  # <--- antes 1
-            )
-            .all()
+        etag = make_etag(
+            "friends_list", player_id, view_version(session, player_id)
         )
+        if is_not_modified(etag):
+            return not_modified(etag)
 
-        if not friend_entries:
-            return jsonify({"friends": []}), 200
+        # IDs de amigos desde el índice en memoria, datos en una sola consulta
+        friend_ids = get_friend_ids(session, player_id)
+        if not friend_ids:
+            return with_etag(jsonify({"friends": []}), etag), 200
 
-        friends_list = []
-        for entry in friend_entries:
-            friend_id = entry.id2 if entry.id1 == player_id else entry.id1
-            friend_player = session.query(Player).filter(Player.id == friend_id).first()
-
-            last_captured = (
-                session.query(PokemonStat.name)
-                .join(
-                    PokemonOwned,
-                    PokemonOwned.pokedex_number == PokemonStat.pokedex_number,
+        friend_players = (
+            session.query(Player.id, Player.username, Player.profile_picture)
+            .filter(Player.id.in_(friend_ids))
+            .all()
+        )
+
+        # Última captura de todos los amigos a la vez: ROW_NUMBER por jugador
+        # sobre el índice (player_id, obtained_at, id)
+        ranked = (
+            select(
+                PokemonOwned.player_id,
+                PokemonOwned.pokedex_number,
+                func.row_number()
+                .over(
+                    partition_by=PokemonOwned.player_id,
+                    order_by=(PokemonOwned.obtained_at.desc(), PokemonOwned.id.desc()),
                 )
-                .filter(PokemonOwned.player_id == friend_id)
-                .order_by(PokemonOwned.obtained_at.desc())
-                .first()
+                .label("position"),
             )
+            .where(PokemonOwned.player_id.in_([friend.id for friend in friend_players]))
+            .subquery()
+        )
+        last_captured = dict(
+            session.query(ranked.c.player_id, ranked.c.pokedex_number)
+            .filter(ranked.c.position == 1)
+            .all()
+        )
 
-            if friend_player:
-                friends_list.append(
-                    {
-                        "id": friend_player.id,
-                        "username": friend_player.username,
-                        "last_captured": last_captured[0] if last_captured else None,
-                        "profile_picture": friend_player.profile_picture,
-                    }
-                )
+        friends_list = []
+        for friend_player in friend_players:
+            last_pokedex = last_captured.get(friend_player.id)
+            friends_list.append(
+                {
+                    "id": friend_player.id,
+                    "username": friend_player.username,
+                    "last_captured": (
+                        get_pokemon_stat(last_pokedex).name if last_pokedex else None
+                    ),
+                    "profile_picture": friend_player.profile_picture,
+                }
+            )
 
-        return jsonify({"friends": friends_list}), 200
+        return with_etag(jsonify({"friends": friends_list}), etag), 200
 
     except Exception as e:
         session.rollback()
@@ -245,6 +290,28 @@ def list_friends():
         session.close()
 
 
+# Amigos conectados, respondido desde memoria
+@friends.route("/friends/online", methods=["GET"])
+@jwt_required()
+def list_online_friends():
+    try:
+        player_id = get_jwt_identity()
+        return jsonify({"online": online_friend_ids(player_id)}), 200
+
+    except Exception as e:
+        return jsonify({"message": str(e)}), 500
+
+
+# Contadores del registro de presencia
+@friends.route("/presence/stats", methods=["GET"])
+@jwt_required()
+def presence_stats():
+    try:
+        return jsonify(presence.stats()), 200
+    except Exception as e:
+        return jsonify({"message": str(e)}), 500
+
+
 # Borrar amigo
 @friends.route("/friends/remove", methods=["DELETE"])
 @jwt_required()
@@ -260,15 +327,17 @@ def remove_friend():
 
         result = session.execute(
             t_friend.delete().where(
-                (
-                    ((t_friend.c.id1 == player_id) & (t_friend.c.id2 == friend_id))
-                    | ((t_friend.c.id1 == friend_id) & (t_friend.c.id2 == player_id))
-                )
-                & t_friend.c.approved.is_(True)  # <--- antes 1
+                pair_filter(player_id, friend_id),
+                t_friend.c.approved.is_(True),  # <--- antes 1
             )
         )
+        if result.rowcount:
+            bump_versions(session, player_id, friend_id)
+            publish_invalidation(session, player_id, friend_id)
 
         session.commit()
+        invalidate_friends(player_id, friend_id)
+        suggestions_cache.pop(player_id, friend_id)
 
         if result.rowcount == 0:
             return jsonify({"message": "Friendship not found"}), 404
@@ -281,3 +350,99 @@ def remove_friend():
 
     finally:
         session.close()
+
+
+def compute_suggestions(session, player_id, min_mutual):
+    friend_ids = get_friend_ids(session, player_id)
+    if not friend_ids:
+        return []
+
+    # Cada fila es una arista (amigo mío, candidato); como la pareja es única,
+    # contar filas por candidato da el número de amigos en común
+    second_hop = union_all(
+        select(t_friend.c.id2.label("candidate")).where(
+            t_friend.c.id1.in_(friend_ids), t_friend.c.approved.is_(True)
+        ),
+        select(t_friend.c.id1.label("candidate")).where(
+            t_friend.c.id2.in_(friend_ids), t_friend.c.approved.is_(True)
+        ),
+    ).subquery()
+
+    # Amigos o solicitudes pendientes en cualquier dirección
+    related = union(
+        select(t_friend.c.id2).where(t_friend.c.id1 == player_id),
+        select(t_friend.c.id1).where(t_friend.c.id2 == player_id),
+    )
+
+    mutual = func.count().label("mutual")
+    ranked = (
+        session.query(second_hop.c.candidate, mutual)
+        .filter(
+            second_hop.c.candidate != player_id,
+            second_hop.c.candidate.not_in(related),
+        )
+        .group_by(second_hop.c.candidate)
+        .having(func.count() >= min_mutual)
+        .order_by(mutual.desc(), second_hop.c.candidate)
+        .limit(MAX_SUGGESTIONS)
+        .all()
+    )
+    if not ranked:
+        return []
+
+    players = {
+        row.id: row
+        for row in session.query(Player.id, Player.username, Player.profile_picture)
+        .filter(Player.id.in_([row.candidate for row in ranked]))
+        .all()
+    }
+
+    return [
+        {
+            "id": row.candidate,
+            "username": players[row.candidate].username,
+            "profile_picture": players[row.candidate].profile_picture,
+            "mutual_friends": row.mutual,
+        }
+        for row in ranked
+        if row.candidate in players
+    ]
+
+
+# Sugerencias: amigos de mis amigos con al menos min_mutual amigos en común
+@friends.route("/friends/suggestions", methods=["GET"])
+@jwt_required()
+def friend_suggestions():
+    try:
+        min_mutual = int(request.args.get("min_mutual", 2))
+        limit = int(request.args.get("limit", 20))
+    except ValueError:
+        return jsonify({"message": "min_mutual and limit must be integers"}), 400
+
+    if min_mutual < 1 or limit < 1 or limit > MAX_SUGGESTIONS:
+        return (
+            jsonify(
+                {
+                    "message": f"min_mutual must be positive and limit between 1 and {MAX_SUGGESTIONS}"
+                }
+            ),
+            400,
+        )
+
+    player_id = get_jwt_identity()
+    session = SessionLocal()
+    try:
+        cached = suggestions_cache.get(player_id)
+        if cached and cached[0] == min_mutual:
+            suggestions = cached[1]
+        else:
+            suggestions = compute_suggestions(session, player_id, min_mutual)
+            suggestions_cache.set(player_id, (min_mutual, suggestions))
+
+        return jsonify({"suggestions": suggestions[:limit]}), 200
+
+    except Exception as e:
+        return jsonify({"message": str(e)}), 500
+
+    finally:
+        session.close()
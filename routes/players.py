@@ -1,8 +1,9 @@
 from flask import Blueprint, jsonify, request
 from flask_bcrypt import Bcrypt
 from sqlalchemy import or_
-from helpers.helpers import create_id
-from models.models import Player
+from helpers.ids import new_id
+from helpers.versioning import bump_peer_versions, bump_versions
+from models.models import Player, PlayerCollectionStats
 from config.db import SessionLocal
 from flask_jwt_extended import create_access_token
 import datetime
@@ -18,7 +19,7 @@ bcrypt = Bcrypt()
 def register():
     data = request.get_json()
 
-    id = create_id(32)
+    id = new_id(32)
     username = data.get("username")
     email = data.get("email")
     password = data.get("password")
@@ -31,7 +32,7 @@ def register():
     try:
         session = SessionLocal()
         existingPlayer = (
-            session.query(Player)
+            session.query(Player.id)
             .filter(or_(Player.email == email, Player.username == username))
             .first()
         )
@@ -46,6 +47,7 @@ def register():
         )
 
         session.add(newPlayer)
+        session.add(PlayerCollectionStats(player_id=id))
         session.commit()
         return jsonify({"message": "Player Created"}), 201
     except Exception as e:
@@ -119,7 +121,7 @@ def change_username():
             return jsonify({"message": "Username missing"}), 400
 
         existing_player = (
-            session.query(Player).filter(Player.username == new_username).first()
+            session.query(Player.id).filter(Player.username == new_username).first()
         )
 
         if existing_player:
@@ -131,7 +133,10 @@ def change_username():
             return jsonify({"message": "Player not found"}), 404
 
         player.username = new_username
+        bump_versions(session, player_id)
         session.commit()
+        # El nombre sale en la lista de amigos y en sus trades pendientes
+        bump_peer_versions([player_id], pending_trades=True)
 
         return jsonify({"message": "Username updated successfully"}), 200
 
@@ -160,7 +165,9 @@ def change_profile_picture():
             return jsonify({"message": "Player not found"}), 404
 
         player.profile_picture = new_picture
+        bump_versions(session, player_id)
         session.commit()
+        bump_peer_versions([player_id])
 
         return jsonify({"message": "Profile picture updated successfully"}), 200
 
@@ -177,7 +184,11 @@ def change_profile_picture():
 def get_player(id):
     try:
         session = SessionLocal()
-        player = session.query(Player).filter(Player.id == id).first()
+        player = (
+            session.query(Player.id, Player.username, Player.profile_picture)
+            .filter(Player.id == id)
+            .first()
+        )
 
         if not player:
             return jsonify({"message": "Player not found"}), 404
@@ -1,56 +1,151 @@
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import get_jwt_identity, jwt_required
+from sqlalchemy import delete, exists, or_
 
 from config.db import SessionLocal
-from models.models import Player, PokemonOwned, PokemonStat
+from helpers.collection_stats import apply_collection_delta
+from helpers.friend_graph import are_friends
+from helpers.pokemon_stats import get_pokemon_stat, get_pokemon_stats
+from helpers.pagination import keyset_before, next_cursor, page_args
+from helpers.streaming import STREAM_BATCH, stream_json_array, wants_stream
+from helpers.versioning import (
+    bump_peer_versions,
+    bump_versions,
+    collection_version,
+    is_not_modified,
+    make_etag,
+    not_modified,
+    with_etag,
+)
+from models.models import (
+    Player,
+    PlayerCollectionStats,
+    PokemonOwned,
+    Trade,
+    TradeItem,
+    TradePokemonLock,
+)
 
 
 pokemon_owned = Blueprint("pokemon_owned", __name__)
 
+MAX_BULK_DELETE = 500
+
+# Solo las columnas que se serializan: filas Row ligeras, sin identity map
+OWNED_COLUMNS = (
+    PokemonOwned.id,
+    PokemonOwned.player_id,
+    PokemonOwned.pokedex_number,
+    PokemonOwned.in_team,
+    PokemonOwned.obtained_at,
+    PokemonOwned.mote,
+)
+
+
+def owned_json(data):
+    stats = get_pokemon_stat(data.pokedex_number)
+    return {
+        "name": stats.name,
+        "id": data.id,
+        "player_id": data.player_id,
+        "pokedex_number": data.pokedex_number,
+        "in_team": data.in_team,
+        "obtained_at": data.obtained_at,
+        "mote": data.mote,
+        "type1": stats.type1,
+    }
+
+
+def public_owned_json(owned, username):
+    stats = get_pokemon_stat(owned.pokedex_number)
+    return {
+        "id": owned.id,
+        "name": stats.name,
+        "owner": username,
+        "type1": stats.type1,
+        "pokedex_number": owned.pokedex_number,
+        "in_team": owned.in_team,
+        "obtained_at": owned.obtained_at,
+        "mote": owned.mote,
+    }
+
 
 # Usuario loggeado
 @pokemon_owned.route("/pokemon/users_pokemon", methods=["GET"])
 @jwt_required()
 def get_all_owned():
     player_id = get_jwt_identity()
+    try:
+        page = page_args(request.args)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    streaming = False
     try:
         session = SessionLocal()
 
-        pokemon_owned_json = []
-        all_pokemon_owned = (
-            session.query(PokemonOwned, PokemonStat)
-            .join(
-                PokemonStat, PokemonStat.pokedex_number == PokemonOwned.pokedex_number
-            )
+        etag = make_etag(
+            "users_pokemon", player_id, collection_version(session, player_id)
+        )
+        if is_not_modified(etag):
+            return not_modified(etag)
+
+        query = (
+            session.query(*OWNED_COLUMNS)
             .filter(PokemonOwned.player_id == player_id)
-            .order_by(PokemonOwned.obtained_at.desc())
-            .all()
+            .order_by(PokemonOwned.obtained_at.desc(), PokemonOwned.id.desc())
         )
 
-        if not all_pokemon_owned:
-            raise ValueError("No pokemon owned")
+        if page:
+            limit, after = page
+            if after:
+                query = query.filter(
+                    keyset_before(PokemonOwned.obtained_at, PokemonOwned.id, after)
+                )
+            all_pokemon_owned = query.limit(limit + 1).all()
+            cursor = next_cursor(
+                all_pokemon_owned,
+                limit,
+                lambda row: row.obtained_at,
+                lambda row: row.id,
+            )
+            all_pokemon_owned = all_pokemon_owned[:limit]
+        elif wants_stream(request.args):
+            rows = iter(query.yield_per(STREAM_BATCH))
+            first = next(rows, None)
 
-        for data, stats in all_pokemon_owned:
-            pokemon_owned_json.append(
-                {
-                    "name": stats.name,
-                    "id": data.id,
-                    "player_id": data.player_id,
-                    "pokedex_number": data.pokedex_number,
-                    "in_team": data.in_team,
-                    "obtained_at": data.obtained_at,
-                    "mote": data.mote,
-                    "type1": stats.type1,
-                }
+            if not first:
+                raise ValueError("No pokemon owned")
+
+            streaming = True
+            return (
+                with_etag(stream_json_array(first, rows, owned_json, session), etag),
+                200,
+            )
+        else:
+            all_pokemon_owned = query.all()
+
+            if not all_pokemon_owned:
+                raise ValueError("No pokemon owned")
+
+        pokemon_owned_json = [owned_json(row) for row in all_pokemon_owned]
+
+        if page:
+            return (
+                with_etag(
+                    jsonify({"pokemon": pokemon_owned_json, "next": cursor}), etag
+                ),
+                200,
             )
 
-        return jsonify(pokemon_owned_json), 200
+        return with_etag(jsonify(pokemon_owned_json), etag), 200
 
     except Exception as e:
         return jsonify({"message": str(e)}), 500
 
     finally:
-        session.close()
+        if not streaming:
+            session.close()
 
 
 @pokemon_owned.route(
@@ -62,26 +157,22 @@ def get_my_pokemon(owned_pokemon_id):
         player_id = get_jwt_identity()
         session = SessionLocal()
 
-        pokemon_entry = (
-            session.query(PokemonOwned, PokemonStat.name)
-            .join(
-                PokemonStat, PokemonStat.pokedex_number == PokemonOwned.pokedex_number
-            )
+        data = (
+            session.query(*OWNED_COLUMNS)
             .filter(
                 PokemonOwned.id == owned_pokemon_id, PokemonOwned.player_id == player_id
             )
             .first()
         )
-        if not pokemon_entry:
+        if not data:
             return (
                 jsonify({"message": "Pokemon not found or doesn't belong to you"}),
                 404,
             )
 
-        data, name = pokemon_entry
         pokemon_json = {
             "id": data.id,
-            "name": name,
+            "name": get_pokemon_stat(data.pokedex_number).name,
             "player_id": data.player_id,
             "pokedex_number": data.pokedex_number,
             "in_team": data.in_team,
@@ -101,21 +192,62 @@ def get_my_pokemon(owned_pokemon_id):
 )
 @jwt_required()
 def other_player_pokemon(player_id):
+    try:
+        page = page_args(request.args)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    streaming = False
     try:
         session = SessionLocal()
 
-        all_pokemon = (
-            session.query(
-                PokemonOwned, PokemonStat.name, PokemonStat.type1, Player.username
+        viewer_id = get_jwt_identity()
+        if viewer_id != player_id and not are_friends(session, viewer_id, player_id):
+            return jsonify({"message": "This player is not your friend"}), 403
+
+        username = (
+            session.query(Player.username).filter(Player.id == player_id).scalar()
+        )
+        query = session.query(*OWNED_COLUMNS).filter(
+            PokemonOwned.player_id == player_id
+        )
+
+        def serialize(owned):
+            return public_owned_json(owned, username)
+
+        if page:
+            limit, after = page
+            query = query.order_by(
+                PokemonOwned.obtained_at.desc(), PokemonOwned.id.desc()
             )
-            .join(
-                PokemonStat, PokemonStat.pokedex_number == PokemonOwned.pokedex_number
+            if after:
+                query = query.filter(
+                    keyset_before(PokemonOwned.obtained_at, PokemonOwned.id, after)
+                )
+            all_pokemon = query.limit(limit + 1).all()
+            cursor = next_cursor(
+                all_pokemon,
+                limit,
+                lambda row: row.obtained_at,
+                lambda row: row.id,
             )
-            .join(Player, Player.id == PokemonOwned.player_id)
-            .filter(PokemonOwned.player_id == player_id)
-            .all()
-        )
-        if not all_pokemon:
+            all_pokemon = all_pokemon[:limit]
+        elif wants_stream(request.args):
+            rows = iter(query.yield_per(STREAM_BATCH))
+            first = next(rows, None)
+
+            if first:
+                streaming = True
+                return stream_json_array(first, rows, serialize, session), 200
+
+            after = None
+            all_pokemon = []
+        else:
+            after = None
+            all_pokemon = query.all()
+
+        # Una página vacía después de un cursor no es un error
+        if not all_pokemon and not after:
             return (
                 jsonify(
                     {"message": "This player is not your friend or has no Pokemon"}
@@ -123,25 +255,17 @@ def other_player_pokemon(player_id):
                 404,
             )
 
-        all_pokemon_json = []
-        for owned, name, type1, username in all_pokemon:
-            all_pokemon_json.append(
-                {
-                    "id": owned.id,
-                    "name": name,
-                    "owner": username,
-                    "type1": type1,
-                    "pokedex_number": owned.pokedex_number,
-                    "in_team": owned.in_team,
-                    "obtained_at": owned.obtained_at,
-                    "mote": owned.mote,
-                }
-            )
+        all_pokemon_json = [serialize(owned) for owned in all_pokemon]
+
+        if page:
+            return jsonify({"pokemon": all_pokemon_json, "next": cursor}), 200
+
         return jsonify(all_pokemon_json), 200
     except Exception as e:
         return jsonify({"message": str(e)}), 500
     finally:
-        session.close()
+        if not streaming:
+            session.close()
 
 
 @pokemon_owned.route("/pokemon/change_mote", methods=["PUT"])
@@ -168,6 +292,7 @@ def change_mote():
             raise ValueError("Pokemon not found or doesn't belong to you")
 
         pokemon_data.mote = mote
+        bump_versions(session, player_id)
 
         session.commit()
         return jsonify({"message": "Changed mote"}), 201
@@ -204,7 +329,14 @@ def transfer_to_box():
             )
 
         session.delete(players_pokemon)
+        # player antes que player_collection_stats, igual que la captura
+        bump_versions(session, player_id)
+        apply_collection_delta(
+            session, player_id, removed=[players_pokemon.pokedex_number]
+        )
         session.commit()
+        # Puede haber sido la última captura que ven sus amigos
+        bump_peer_versions([player_id])
 
         return (
             jsonify(
@@ -220,3 +352,128 @@ def transfer_to_box():
 
     finally:
         session.close()
+
+
+# Liberar muchos Pokémon en una sola transacción
+@pokemon_owned.route("/pokemon/bulk_delete", methods=["DELETE"])
+@jwt_required()
+def bulk_transfer_to_box():
+    data = request.get_json(silent=True) or {}
+    pokemon_ids = data.get("pokemon_ids")
+    player_id = get_jwt_identity()
+
+    if (
+        not isinstance(pokemon_ids, list)
+        or not pokemon_ids
+        or not all(isinstance(pokemon_id, str) for pokemon_id in pokemon_ids)
+    ):
+        return jsonify({"message": "pokemon_ids must be a list of ids"}), 400
+
+    pokemon_ids = list(dict.fromkeys(pokemon_ids))
+    if len(pokemon_ids) > MAX_BULK_DELETE:
+        return (
+            jsonify({"message": f"Cannot delete more than {MAX_BULK_DELETE} at once"}),
+            400,
+        )
+
+    in_trade = or_(
+        Trade.requester_pokemon_id == PokemonOwned.id,
+        Trade.receiver_pokemon_id == PokemonOwned.id,
+    )
+    in_pending_trade = exists().where(TradePokemonLock.pokemon_id == PokemonOwned.id)
+    # Un trade ya decidido sigue apuntando al Pokémon (FK), tampoco se puede borrar
+    in_any_trade = or_(
+        exists().where(in_trade),
+        exists().where(TradeItem.pokemon_id == PokemonOwned.id),
+    )
+
+    session = SessionLocal()
+    try:
+        # Bloquea las filas para que nadie las meta en un trade mientras tanto
+        owned = (
+            session.query(
+                PokemonOwned.id,
+                PokemonOwned.pokedex_number,
+                in_pending_trade.label("locked"),
+                in_any_trade.label("traded"),
+            )
+            .filter(PokemonOwned.player_id == player_id)
+            .filter(PokemonOwned.id.in_(pokemon_ids))
+            .with_for_update(of=PokemonOwned)
+            .all()
+        )
+
+        results = {pokemon_id: "not_found" for pokemon_id in pokemon_ids}
+        deletable = []
+        removed = []
+        for row in owned:
+            if row.locked:
+                results[row.id] = "locked"
+            elif row.traded:
+                results[row.id] = "in_trade_history"
+            else:
+                results[row.id] = "deleted"
+                deletable.append(row.id)
+                removed.append(row.pokedex_number)
+
+        if deletable:
+            session.execute(
+                delete(PokemonOwned)
+                .where(
+                    PokemonOwned.player_id == player_id,
+                    PokemonOwned.id.in_(deletable),
+                )
+                .execution_options(synchronize_session=False)
+            )
+            bump_versions(session, player_id)
+            apply_collection_delta(session, player_id, removed=removed)
+
+        session.commit()
+        if deletable:
+            bump_peer_versions([player_id])
+
+        return jsonify({"deleted": len(deletable), "results": results}), 200
+
+    except Exception as e:
+        session.rollback()
+        return jsonify({"message": str(e)}), 500
+
+    finally:
+        session.close()
+
+
+# Resumen de la colección: una sola lectura por llave primaria
+@pokemon_owned.route("/pokemon/summary/<string:player_id>", methods=["GET"])
+@jwt_required()
+def collection_summary(player_id):
+    session = SessionLocal()
+    try:
+        stats = session.get(PlayerCollectionStats, player_id)
+        dex_size = len(get_pokemon_stats())
+
+        total = stats.total if stats else 0
+        unique_species = stats.unique_species if stats else 0
+
+        return (
+            jsonify(
+                {
+                    "player_id": player_id,
+                    "total": total,
+                    "unique_species": unique_species,
+                    "dex_size": dex_size,
+                    "completion": (
+                        round(unique_species / dex_size, 4) if dex_size else 0
+                    ),
+                    "legendary": stats.legendary if stats else 0,
+                    "by_type": stats.by_type if stats else {},
+                    "by_generation": stats.by_generation if stats else {},
+                }
+            ),
+            200,
+        )
+
+    except Exception as e:
+        return jsonify({"message": str(e)}), 500
+
+    finally:
+        session.close()
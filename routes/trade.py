@@ -1,16 +1,83 @@
+import os
+
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import get_jwt_identity, jwt_required
 
 from config.db import SessionLocal
-from models.models import Trade, TradeStatus, Player, PokemonOwned, PokemonStat
-import uuid
+from models.models import (
+    Trade,
+    TradeItem,
+    TradeStatus,
+    TradePokemonLock,
+    Player,
+    PokemonOwned,
+)
+from helpers.collection_stats import apply_trade_delta
+from helpers.friend_graph import are_friends
+from helpers.helpers import is_duplicate_key, player_username
+from helpers.ids import new_id
+from helpers.pagination import DEFAULT_LIMIT, keyset_before, next_cursor, page_args
+from helpers.pokemon_stats import get_pokemon_stat
+from helpers.trade_expiry import TRADE_TTL_HOURS, sweep_metrics
+from helpers.trade_locks import (
+    add_trade_items,
+    lock_trade_pokemon,
+    locked_pokemon_ids,
+    release_trade_locks,
+)
+from helpers.versioning import (
+    bump_peer_versions,
+    bump_versions,
+    is_not_modified,
+    make_etag,
+    not_modified,
+    view_version,
+    with_etag,
+)
 from datetime import datetime
+from sqlalchemy import case, literal, select, union_all, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import aliased
-from events import connected_users
-from extensions import socketio
+from notifications import notify
 
 trade = Blueprint("trade", __name__)
 
+MAX_BUNDLE_SIZE = int(os.getenv("MAX_BUNDLE_SIZE", "6"))
+
+
+def pokemon_name(pokedex_number):
+    return get_pokemon_stat(pokedex_number).name if pokedex_number else None
+
+
+# Pokémon de cada trade en una sola lectura: {trade_id: [items]}
+def trade_items(session, trade_ids):
+    items = {trade_id: [] for trade_id in trade_ids}
+    if not items:
+        return items
+
+    rows = (
+        session.query(
+            TradeItem.trade_id,
+            TradeItem.pokemon_id,
+            TradeItem.player_id,
+            PokemonOwned.pokedex_number,
+        )
+        .join(PokemonOwned, PokemonOwned.id == TradeItem.pokemon_id)
+        .filter(TradeItem.trade_id.in_(list(items)))
+        .order_by(TradeItem.trade_id, TradeItem.pokemon_id)
+    )
+    for row in rows:
+        items[row.trade_id].append(
+            {
+                "pokemon_id": row.pokemon_id,
+                "player_id": row.player_id,
+                "pokedex_number": row.pokedex_number,
+                "name": pokemon_name(row.pokedex_number),
+            }
+        )
+
+    return items
+
 
 @trade.route("/trade/<string:friend_id>", methods=["GET"])
 @jwt_required()
@@ -19,7 +86,16 @@ def get_requests_specific(friend_id):
     session = SessionLocal()
     try:
         trades = (
-            session.query(Trade)
+            session.query(
+                Trade.id,
+                Trade.requester_id,
+                Trade.receiver_id,
+                Trade.requester_pokemon_id,
+                Trade.receiver_pokemon_id,
+                Trade.status,
+                Trade.created_at,
+                Trade.decided_at,
+            )
             .filter(
                 ((Trade.requester_id == trainer_id) & (Trade.receiver_id == friend_id))
                 | (
@@ -33,6 +109,8 @@ def get_requests_specific(friend_id):
         if not trades:
             return jsonify({"message": "No pending trades with that friend"}), 404
 
+        items = trade_items(session, [t.id for t in trades])
+
         trades_json = []
         for t in trades:
             trades_json.append(
@@ -45,6 +123,7 @@ def get_requests_specific(friend_id):
                     "status": t.status.value,
                     "created_at": t.created_at,
                     "decided_at": t.decided_at,
+                    "items": items[t.id],
                 }
             )
 
@@ -68,22 +147,65 @@ def request_pokemon():
     if not friend_id or not requester_pokemon_id or not receiver_pokemon_id:
         return jsonify({"message": "Parameters missing"}), 400
 
+    if requester_pokemon_id == receiver_pokemon_id:
+        return jsonify({"message": "Repeated Pokémon in the trade"}), 400
+
+    owners = {requester_pokemon_id: player_id, receiver_pokemon_id: friend_id}
+
     session = SessionLocal()
     try:
-        # Verificar si el Pokémon del requester ya está en un trade pendiente
-        existing_trade_requester = (
-            session.query(Trade)
-            .filter(
-                (
-                    (Trade.requester_pokemon_id == requester_pokemon_id)
-                    | (Trade.receiver_pokemon_id == requester_pokemon_id)
-                ),
-                Trade.status == TradeStatus.pending,
+        if not are_friends(session, player_id, friend_id):
+            return jsonify({"message": "You can only trade with friends"}), 403
+
+        current = dict(
+            session.query(PokemonOwned.id, PokemonOwned.player_id).filter(
+                PokemonOwned.id.in_(list(owners))
             )
-            .first()
+        )
+        if current != owners:
+            return (
+                jsonify({"message": "Pokémon not found or not owned by the traders"}),
+                404,
+            )
+
+        trade_id = new_id()
+        trade = Trade(
+            id=trade_id,
+            requester_id=player_id,
+            receiver_id=friend_id,
+            requester_pokemon_id=requester_pokemon_id,
+            receiver_pokemon_id=receiver_pokemon_id,
+            status=TradeStatus.pending,
+            created_at=datetime.now(),
+        )
+
+        session.add(trade)
+        session.flush()
+        add_trade_items(session, trade_id, owners)
+        lock_trade_pokemon(session, trade_id, owners)
+        bump_versions(session, player_id, friend_id)
+        username = player_username(session, player_id)
+        session.commit()
+
+        notify(
+            friend_id,
+            "trade_received",
+            {
+                "trade_id": trade_id,
+                "from_user_id": player_id,
+                "from_username": username,
+            },
         )
 
-        if existing_trade_requester:
+        return jsonify({"message": "Trade Request created"}), 201
+
+    except IntegrityError as e:
+        session.rollback()
+        if not is_duplicate_key(e):
+            return jsonify({"message": str(e)}), 500
+
+        # Solo en el camino de error: saber cuál de los dos estaba bloqueado
+        if requester_pokemon_id in locked_pokemon_ids(session, [requester_pokemon_id]):
             return (
                 jsonify(
                     {"message": "Este Pokémon ya está en un intercambio pendiente."}
@@ -91,42 +213,119 @@ def request_pokemon():
                 400,
             )
 
-        # Verificar si el Pokémon del receiver ya está en un trade pendiente
-        existing_trade_receiver = (
-            session.query(Trade)
-            .filter(
-                (
-                    (Trade.requester_pokemon_id == receiver_pokemon_id)
-                    | (Trade.receiver_pokemon_id == receiver_pokemon_id)
-                ),
-                Trade.status == TradeStatus.pending,
-            )
-            .first()
+        return (
+            jsonify(
+                {
+                    "message": "El Pokémon seleccionado ya está en un intercambio pendiente."
+                }
+            ),
+            400,
         )
 
-        if existing_trade_receiver:
+    except Exception as e:
+        return jsonify({"message": str(e)}), 500
+
+    finally:
+        session.close()
+
+
+# Mandar un paquete: varios Pokémon por lado en un solo trade
+@trade.route("/trade/send_bundle", methods=["POST"])
+@jwt_required()
+def request_bundle():
+    player_id = get_jwt_identity()
+    data = request.get_json()
+    friend_id = data.get("friend_id")
+    offered = data.get("offered_pokemon_ids")
+    requested = data.get("requested_pokemon_ids")
+
+    if not friend_id or not offered or not requested:
+        return jsonify({"message": "Parameters missing"}), 400
+
+    if not all(
+        isinstance(ids, list) and all(isinstance(i, str) for i in ids)
+        for ids in (offered, requested)
+    ):
+        return jsonify({"message": "Pokémon ids must be lists of ids"}), 400
+
+    owners = {pokemon_id: player_id for pokemon_id in offered}
+    owners.update({pokemon_id: friend_id for pokemon_id in requested})
+    if len(owners) != len(offered) + len(requested):
+        return jsonify({"message": "Repeated Pokémon in the bundle"}), 400
+
+    if len(offered) > MAX_BUNDLE_SIZE or len(requested) > MAX_BUNDLE_SIZE:
+        return (
+            jsonify(
+                {"message": f"Cannot trade more than {MAX_BUNDLE_SIZE} per side"}
+            ),
+            400,
+        )
+
+    session = SessionLocal()
+    try:
+        if not are_friends(session, player_id, friend_id):
+            return jsonify({"message": "You can only trade with friends"}), 403
+
+        current = dict(
+            session.query(PokemonOwned.id, PokemonOwned.player_id).filter(
+                PokemonOwned.id.in_(list(owners))
+            )
+        )
+        if current != owners:
             return (
-                jsonify(
-                    {
-                        "message": "El Pokémon seleccionado ya está en un intercambio pendiente."
-                    }
-                ),
-                400,
+                jsonify({"message": "Pokémon not found or not owned by the traders"}),
+                404,
             )
 
+        trade_id = new_id()
         trade = Trade(
-            id=str(uuid.uuid4()),
+            id=trade_id,
             requester_id=player_id,
             receiver_id=friend_id,
-            requester_pokemon_id=requester_pokemon_id,
-            receiver_pokemon_id=receiver_pokemon_id,
             status=TradeStatus.pending,
             created_at=datetime.now(),
         )
 
         session.add(trade)
+        session.flush()
+        add_trade_items(session, trade_id, owners)
+        lock_trade_pokemon(session, trade_id, owners)
+        bump_versions(session, player_id, friend_id)
+        username = player_username(session, player_id)
         session.commit()
-        return jsonify({"message": "Trade Request created"}), 201
+
+        notify(
+            friend_id,
+            "trade_received",
+            {
+                "trade_id": trade_id,
+                "from_user_id": player_id,
+                "from_username": username,
+                "bundle": True,
+            },
+        )
+
+        return (
+            jsonify({"message": "Trade Request created", "trade_id": trade_id}),
+            201,
+        )
+
+    except IntegrityError as e:
+        session.rollback()
+        if not is_duplicate_key(e):
+            return jsonify({"message": str(e)}), 500
+
+        return (
+            jsonify(
+                {
+                    "message": "Some Pokémon are already in a pending trade",
+                    "locked_pokemon_ids": sorted(
+                        locked_pokemon_ids(session, list(owners))
+                    ),
+                }
+            ),
+            400,
+        )
 
     except Exception as e:
         return jsonify({"message": str(e)}), 500
@@ -135,6 +334,96 @@ def request_pokemon():
         session.close()
 
 
+# Confirma el intercambio en una sola transacción: bloquea el trade y todos
+# sus Pokémon con un solo SELECT ... FOR UPDATE, verifica que sigan siendo de
+# quienes los ofrecieron e intercambia dueños con un solo UPDATE.
+# Regresa (status http, mensaje, fila del trade o None); no hace commit.
+def confirm_trade(session, trade_id, player_id):
+    locked = (
+        session.query(
+            Trade.id,
+            Trade.requester_id,
+            Trade.receiver_id,
+            Trade.status,
+            TradeItem.pokemon_id,
+            TradeItem.player_id.label("offered_by"),
+            PokemonOwned.player_id.label("owner"),
+            PokemonOwned.pokedex_number,
+        )
+        .outerjoin(TradeItem, TradeItem.trade_id == Trade.id)
+        .outerjoin(PokemonOwned, PokemonOwned.id == TradeItem.pokemon_id)
+        .filter(Trade.id == trade_id)
+        .with_for_update()
+        .all()
+    )
+
+    if not locked:
+        return 404, "Trade not found", None
+
+    trade_row = locked[0]
+
+    if trade_row.receiver_id != player_id:
+        return 403, "You cannot confirm this trade", None
+
+    if trade_row.status != TradeStatus.pending:
+        return 400, "Trade already decided", None
+
+    # Un intercambio lleva al menos un Pokémon de cada lado
+    items = [row for row in locked if row.pokemon_id]
+    if {row.offered_by for row in items} != {
+        trade_row.requester_id,
+        trade_row.receiver_id,
+    }:
+        return 409, "Trade must include Pokémon from both players", None
+
+    if any(row.owner != row.offered_by for row in items):
+        return 409, "Pokémon no longer belongs to the traders", None
+
+    # Condicionado a pending: aunque la BD no respete FOR UPDATE, solo una
+    # confirmación puede ganar
+    decided = session.execute(
+        update(Trade)
+        .where(Trade.id == trade_id, Trade.status == TradeStatus.pending)
+        .values(status=TradeStatus.accepted, decided_at=datetime.now())
+        .execution_options(synchronize_session=False)
+    )
+    if decided.rowcount != 1:
+        return 400, "Trade already decided", None
+
+    release_trade_locks(session, trade_id)
+
+    requester_id, receiver_id = trade_row.requester_id, trade_row.receiver_id
+    session.execute(
+        update(PokemonOwned)
+        .where(PokemonOwned.id.in_([row.pokemon_id for row in items]))
+        .values(
+            player_id=case(
+                (PokemonOwned.player_id == requester_id, receiver_id),
+                else_=requester_id,
+            )
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+    # Primero player y luego player_collection_stats, el mismo orden que la
+    # captura, para que no se bloqueen entre sí
+    bump_versions(session, requester_id, receiver_id)
+
+    given = {requester_id: [], receiver_id: []}
+    for row in items:
+        given[row.offered_by].append(row.pokedex_number)
+
+    apply_trade_delta(
+        session,
+        {
+            requester_id: (given[receiver_id], given[requester_id]),
+            receiver_id: (given[requester_id], given[receiver_id]),
+        },
+    )
+
+    return 202, "Trade confirmed successfully", trade_row
+
+
 # Confirmando el intercambio de pokemon
 @trade.route("/trade/confirm", methods=["POST"])
 @jwt_required()
@@ -150,66 +439,29 @@ def confirm_request():
     session = SessionLocal()
 
     try:
-        trade = session.query(Trade).filter(Trade.id == trade_id).first()
+        status, message, confirmed = confirm_trade(session, trade_id, player_id)
 
-        if not trade:
-            return jsonify({"message": "Trade not found"}), 404
-
-        if trade.receiver_id != player_id:
-            return jsonify({"message": "You cannot confirm this trade"}), 403
-
-        if trade.status != TradeStatus.pending:
-            return jsonify({"message": "Trade already decided"}), 400
-
-        requester_user = (
-            session.query(Player).filter(Player.id == trade.requester_id).first()
-        )
-        receiver_user = (
-            session.query(Player).filter(Player.id == trade.receiver_id).first()
-        )
-
-        trade.status = TradeStatus.accepted
-        trade.decided_at = datetime.now()
-
-        requester_pokemon = (
-            session.query(PokemonOwned)
-            .filter(PokemonOwned.id == trade.requester_pokemon_id)
-            .first()
-        )
-        receiver_pokemon = (
-            session.query(PokemonOwned)
-            .filter(PokemonOwned.id == trade.receiver_pokemon_id)
-            .first()
-        )
-
-        if not requester_pokemon or not receiver_pokemon:
-            return jsonify({"message": "Pokémon missing"}), 404
-
-        requester_pokemon.player_id, receiver_pokemon.player_id = (
-            receiver_pokemon.player_id,
-            requester_pokemon.player_id,
-        )
+        if not confirmed:
+            session.rollback()
+            return jsonify({"message": message}), status
 
+        username = player_username(session, player_id)
         session.commit()
+        # Los Pokémon cambian de dueño: la última captura de ambos puede cambiar
+        bump_peer_versions([confirmed.requester_id, confirmed.receiver_id])
+
+        # El aviso sale solo después del commit y lo manda el dispatcher
+        notify(
+            confirmed.requester_id,
+            "trade_accepted",
+            {
+                "trade_id": trade_id,
+                "message": "Tu intercambio fue aceptado",
+                "other_username": username,
+            },
+        )
 
-        requester_id = trade.requester_id
-
-        if requester_id in connected_users:
-            print("Enviando notificación al usuario creador:", requester_id)
-
-            socketio.emit(
-                "trade_accepted",
-                {
-                    "trade_id": trade_id,
-                    "message": "Tu intercambio fue aceptado",
-                    "other_username": receiver_user.username,
-                },
-                room=connected_users[requester_id],
-            )
-        else:
-            print("Usuario no conectado, no se puede enviar WS")
-
-        return jsonify({"message": "Trade confirmed successfully"}), 202
+        return jsonify({"message": message}), status
 
     except Exception as e:
         session.rollback()
@@ -233,25 +485,54 @@ def deny_request():
     session = SessionLocal()
 
     try:
-        trade = session.query(Trade).filter(Trade.id == trade_id).first()
-
-        if not trade:
-            return jsonify({"message": "That pending trade doesn't exist"}), 404
-
-        if trade.receiver_id != player_id:
-            return (
-                jsonify({"message": "You are not authorized to confirm this trade"}),
-                403,
+        # Condicionado a pending, como confirm_trade y el sweeper: si otro ya
+        # lo aceptó o expiró, no se sobrescribe su estado
+        denied = session.execute(
+            update(Trade)
+            .where(
+                Trade.id == trade_id,
+                Trade.receiver_id == player_id,
+                Trade.status == TradeStatus.pending,
             )
+            .values(status=TradeStatus.rejected, decided_at=datetime.now())
+            .execution_options(synchronize_session=False)
+        )
 
-        if trade.status != TradeStatus.pending:
+        if denied.rowcount != 1:
+            session.rollback()
+            trade = (
+                session.query(Trade.receiver_id).filter(Trade.id == trade_id).first()
+            )
+            if not trade:
+                return jsonify({"message": "That pending trade doesn't exist"}), 404
+            if trade.receiver_id != player_id:
+                return (
+                    jsonify(
+                        {"message": "You are not authorized to confirm this trade"}
+                    ),
+                    403,
+                )
             return jsonify({"message": "Trade already decided"}), 400
 
-        trade.status = TradeStatus.rejected
-        trade.decided_at = datetime.now()
+        requester_id = (
+            session.query(Trade.requester_id).filter(Trade.id == trade_id).scalar()
+        )
+        release_trade_locks(session, trade_id)
+        bump_versions(session, requester_id, player_id)
 
+        username = player_username(session, player_id)
         session.commit()
 
+        notify(
+            requester_id,
+            "trade_denied",
+            {
+                "trade_id": trade_id,
+                "message": "Tu intercambio fue rechazado",
+                "other_username": username,
+            },
+        )
+
         return (
             jsonify({"message": f"Trade with id: {trade_id} has been denied"}),
             200,
@@ -273,42 +554,41 @@ def get_pending_trades():
     # Aliases for clean joins
     RequesterOwned = aliased(PokemonOwned)
     ReceiverOwned = aliased(PokemonOwned)
-    RequesterStat = aliased(PokemonStat)
-    ReceiverStat = aliased(PokemonStat)
 
     try:
+        etag = make_etag(
+            "pending_trades", player_id, view_version(session, player_id)
+        )
+        if is_not_modified(etag):
+            return not_modified(etag)
+
         trades = (
             session.query(
                 Trade.id.label("trade_id"),
                 # requester info
                 Player.username.label("requester_name"),
-                RequesterStat.name.label("requester_pokemon_name"),
-                RequesterStat.pokedex_number.label("requester_pokedex"),
+                RequesterOwned.pokedex_number.label("requester_pokedex"),
                 RequesterOwned.id.label("requester_pokemon_id"),
                 # receiver info (your Pokémon)
                 ReceiverOwned.id.label("receiver_pokemon_id"),
-                ReceiverStat.name.label("receiver_pokemon_name"),
-                ReceiverStat.pokedex_number.label("receiver_pokedex"),
+                ReceiverOwned.pokedex_number.label("receiver_pokedex"),
             )
-            # JOINS for requester
+            # JOINS for requester (names come from the pokemon_stat cache)
             .join(Player, Player.id == Trade.requester_id)
-            .join(RequesterOwned, RequesterOwned.id == Trade.requester_pokemon_id)
-            .join(
-                RequesterStat,
-                RequesterStat.pokedex_number == RequesterOwned.pokedex_number,
+            # Outer joins: bundles leave these columns NULL and use trade_item
+            .outerjoin(
+                RequesterOwned, RequesterOwned.id == Trade.requester_pokemon_id
             )
             # JOINS for receiver (you)
-            .join(ReceiverOwned, ReceiverOwned.id == Trade.receiver_pokemon_id)
-            .join(
-                ReceiverStat,
-                ReceiverStat.pokedex_number == ReceiverOwned.pokedex_number,
-            )
+            .outerjoin(ReceiverOwned, ReceiverOwned.id == Trade.receiver_pokemon_id)
             # Only trades pending for this player
             .filter(Trade.receiver_id == player_id)
             .filter(Trade.status == TradeStatus.pending)
             .all()
         )
 
+        items = trade_items(session, [row.trade_id for row in trades])
+
         result = []
         for row in trades:
             result.append(
@@ -316,17 +596,18 @@ def get_pending_trades():
                     "trade_id": row.trade_id,
                     "from_user": row.requester_name,
                     # offered Pokémon (their Pokémon)
-                    "pokemon_offered": row.requester_pokemon_name,
+                    "pokemon_offered": pokemon_name(row.requester_pokedex),
                     "pokemon_offered_number": row.requester_pokedex,
                     "requester_pokemon_id": row.requester_pokemon_id,
                     # your Pokémon
-                    "your_pokemon_name": row.receiver_pokemon_name,
+                    "your_pokemon_name": pokemon_name(row.receiver_pokedex),
                     "your_pokemon_number": row.receiver_pokedex,
                     "your_pokemon_id": row.receiver_pokemon_id,
+                    "items": items[row.trade_id],
                 }
             )
 
-        return jsonify(result), 200
+        return with_etag(jsonify(result), etag), 200
 
     except Exception as e:
         print("ERROR EN TRADE REQUESTS:", e)
@@ -344,12 +625,19 @@ def get_my_outgoing_requests():
     session = SessionLocal()
     try:
         trades = (
-            session.query(Trade)
+            session.query(
+                Trade.id,
+                Trade.requester_pokemon_id,
+                Trade.receiver_pokemon_id,
+                Trade.status,
+            )
             .filter(Trade.requester_id == player_id)
             .filter(Trade.status == TradeStatus.pending)
             .all()
         )
 
+        items = trade_items(session, [t.id for t in trades])
+
         result = []
         for t in trades:
             result.append(
@@ -358,6 +646,7 @@ def get_my_outgoing_requests():
                     "requester_pokemon_id": t.requester_pokemon_id,
                     "receiver_pokemon_id": t.receiver_pokemon_id,
                     "status": t.status.value,
+                    "items": items[t.id],
                 }
             )
 
@@ -377,25 +666,16 @@ def get_blocked_pokemon(friend_id):
     session = SessionLocal()
 
     try:
-        trades = (
-            session.query(Trade)
-            .filter(
-                (
-                    (Trade.requester_id == friend_id)
-                    & (Trade.status == TradeStatus.pending)
-                )
-                | (
-                    (Trade.receiver_id == friend_id)
-                    & (Trade.status == TradeStatus.pending)
-                )
-            )
-            .all()
+        # Ambos Pokémon de cada trade pendiente donde participa el amigo
+        friend_trades = session.query(TradePokemonLock.trade_id).filter(
+            TradePokemonLock.player_id == friend_id
         )
-
-        blocked_pokemon_ids = []
-        for trade in trades:
-            blocked_pokemon_ids.append(trade.requester_pokemon_id)
-            blocked_pokemon_ids.append(trade.receiver_pokemon_id)
+        blocked_pokemon_ids = [
+            row.pokemon_id
+            for row in session.query(TradePokemonLock.pokemon_id).filter(
+                TradePokemonLock.trade_id.in_(friend_trades)
+            )
+        ]
 
         print(
             f"Bloqueados de {friend_id}: {blocked_pokemon_ids}"
@@ -407,3 +687,145 @@ def get_blocked_pokemon(friend_id):
         return jsonify({"message": str(e)}), 500
     finally:
         session.close()
+
+
+# Métricas del sweeper de trades expirados (de este proceso)
+@trade.route("/trade/expiry/metrics", methods=["GET"])
+@jwt_required()
+def get_expiry_metrics():
+    return jsonify({"ttl_hours": TRADE_TTL_HOURS, **sweep_metrics}), 200
+
+
+HISTORY_STATUSES = (TradeStatus.accepted, TradeStatus.rejected, TradeStatus.expired)
+
+
+def history_statuses(args):
+    raw = args.get("status")
+    if not raw:
+        return HISTORY_STATUSES
+
+    try:
+        # Sin repetidos: cada status es un SELECT propio en history_query
+        return tuple(dict.fromkeys(TradeStatus(value) for value in raw.split(",")))
+    except ValueError:
+        raise ValueError(
+            "status must be one of: " + ", ".join(s.value for s in TradeStatus)
+        )
+
+
+# Una página de historial de un jugador: un SELECT por (lado, status), cada
+# uno con igualdad en las dos primeras columnas de su índice (jugador, status,
+# created_at) para que salga ya ordenado por fecha y se corte en limit + 1 sin
+# filesort. Un IN sobre status partiría el índice en rangos y obligaría a
+# ordenar todo el historial restante. Se unen con UNION ALL y se ordena solo
+# lo que queda (a lo más lados * statuses * (limit + 1) filas).
+def history_query(player_id, statuses, limit, after=None):
+    def page(player_column, direction, status):
+        query = select(
+            Trade.id,
+            Trade.requester_id,
+            Trade.receiver_id,
+            Trade.requester_pokemon_id,
+            Trade.receiver_pokemon_id,
+            Trade.status,
+            Trade.created_at,
+            Trade.decided_at,
+            literal(direction).label("direction"),
+        ).where(player_column == player_id, Trade.status == status)
+        if after:
+            query = query.where(keyset_before(Trade.created_at, Trade.id, after))
+        ordered = (
+            query.order_by(Trade.created_at.desc(), Trade.id.desc())
+            .limit(limit + 1)
+            .subquery()
+        )
+        return select(*ordered.c)
+
+    return union_all(
+        *(
+            page(player_column, direction, status)
+            for player_column, direction in (
+                (Trade.requester_id, "sent"),
+                (Trade.receiver_id, "received"),
+            )
+            for status in statuses
+        )
+    ).subquery()
+
+
+# Historial de intercambios (enviados y recibidos), paginado por
+# (created_at, id)
+@trade.route("/trade/history", methods=["GET"])
+@jwt_required()
+def get_trade_history():
+    player_id = get_jwt_identity()
+    try:
+        limit, after = page_args(request.args) or (DEFAULT_LIMIT, None)
+        statuses = history_statuses(request.args)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    session = SessionLocal()
+    try:
+        both = history_query(player_id, statuses, limit, after)
+
+        RequesterOwned = aliased(PokemonOwned)
+        ReceiverOwned = aliased(PokemonOwned)
+        Requester = aliased(Player)
+        Receiver = aliased(Player)
+
+        rows = session.execute(
+            select(
+                both,
+                Requester.username.label("requester_name"),
+                Receiver.username.label("receiver_name"),
+                RequesterOwned.pokedex_number.label("requester_pokedex"),
+                ReceiverOwned.pokedex_number.label("receiver_pokedex"),
+            )
+            .outerjoin(Requester, Requester.id == both.c.requester_id)
+            .outerjoin(Receiver, Receiver.id == both.c.receiver_id)
+            .outerjoin(RequesterOwned, RequesterOwned.id == both.c.requester_pokemon_id)
+            .outerjoin(ReceiverOwned, ReceiverOwned.id == both.c.receiver_pokemon_id)
+            .order_by(both.c.created_at.desc(), both.c.id.desc())
+            .limit(limit + 1)
+        ).all()
+
+        cursor = next_cursor(rows, limit, lambda row: row.created_at, lambda row: row.id)
+        rows = rows[:limit]
+        items = trade_items(session, [row.id for row in rows])
+
+        result = []
+        for row in rows:
+            sent = row.direction == "sent"
+            your_pokedex = row.requester_pokedex if sent else row.receiver_pokedex
+            their_pokedex = row.receiver_pokedex if sent else row.requester_pokedex
+            result.append(
+                {
+                    "trade_id": row.id,
+                    "direction": row.direction,
+                    "status": row.status.value,
+                    "other_player_id": row.receiver_id if sent else row.requester_id,
+                    "other_username": row.receiver_name if sent else row.requester_name,
+                    "your_pokemon_id": (
+                        row.requester_pokemon_id if sent else row.receiver_pokemon_id
+                    ),
+                    "your_pokemon_number": your_pokedex,
+                    "your_pokemon_name": pokemon_name(your_pokedex),
+                    "their_pokemon_id": (
+                        row.receiver_pokemon_id if sent else row.requester_pokemon_id
+                    ),
+                    "their_pokemon_number": their_pokedex,
+                    "their_pokemon_name": pokemon_name(their_pokedex),
+                    "items": items[row.id],
+                    "created_at": row.created_at,
+                    "decided_at": row.decided_at,
+                }
+            )
+
+        return jsonify({"trades": result, "next": cursor}), 200
+
+    except Exception as e:
+        return jsonify({"message": str(e)}), 500
+
+    finally:
+        session.close()
@@ -0,0 +1,201 @@
+"""Micro-benchmark: full ORM entities vs column projections on read endpoints.
+
+Seeds an in-memory SQLite database with the app models and, for the query
+shape of each read endpoint, measures rows/sec for loading full entities and
+building the response dicts vs selecting only the serialised columns:
+
+  python tools/bench_projection.py --rows 20000 --repeat 5
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.models import (
+    Base,
+    Player,
+    PokemonOwned,
+    PokemonStat,
+    Trade,
+    TradeStatus,
+)
+
+OWNED_COLUMNS = (
+    PokemonOwned.id,
+    PokemonOwned.player_id,
+    PokemonOwned.pokedex_number,
+    PokemonOwned.in_team,
+    PokemonOwned.obtained_at,
+    PokemonOwned.mote,
+)
+
+
+def seed(session, rows):
+    session.add_all(
+        PokemonStat(pokedex_number=n, name=f"mon{n}", type1="normal", capture_rate=45)
+        for n in range(1, 152)
+    )
+    session.add_all(
+        Player(id=f"P{n}", username=f"user{n}", email=f"{n}@x", password="x")
+        for n in range(2)
+    )
+    session.flush()
+
+    start = datetime(2024, 1, 1)
+    session.add_all(
+        PokemonOwned(
+            id=f"{n:024d}",
+            player_id=f"P{n % 2}",
+            pokedex_number=1 + n % 151,
+            in_team=False,
+            obtained_at=start + timedelta(seconds=n),
+        )
+        for n in range(rows)
+    )
+    session.flush()
+
+    session.add_all(
+        Trade(
+            id=f"T{n:035d}",
+            requester_id="P0",
+            receiver_id="P1",
+            requester_pokemon_id=f"{2 * n:024d}",
+            receiver_pokemon_id=f"{2 * n + 1:024d}",
+            status=TradeStatus.pending,
+            created_at=start,
+        )
+        for n in range(rows // 2)
+    )
+    session.commit()
+
+
+def owned_dict(row):
+    return {
+        "id": row.id,
+        "player_id": row.player_id,
+        "pokedex_number": row.pokedex_number,
+        "in_team": row.in_team,
+        "obtained_at": row.obtained_at,
+        "mote": row.mote,
+    }
+
+
+def trade_dict(row):
+    return {
+        "id": row.id,
+        "requester_id": row.requester_id,
+        "receiver_id": row.receiver_id,
+        "requester_pokemon_id": row.requester_pokemon_id,
+        "receiver_pokemon_id": row.receiver_pokemon_id,
+        "status": row.status.value,
+        "created_at": row.created_at,
+        "decided_at": row.decided_at,
+    }
+
+
+def blocked_ids(rows):
+    ids = []
+    for row in rows:
+        ids.append(row.requester_pokemon_id)
+        ids.append(row.receiver_pokemon_id)
+    return ids
+
+
+# (endpoint, query con entidades, query con columnas, serializador)
+CASES = [
+    (
+        "users_pokemon",
+        lambda s: s.query(PokemonOwned).filter(PokemonOwned.player_id == "P0"),
+        lambda s: s.query(*OWNED_COLUMNS).filter(PokemonOwned.player_id == "P0"),
+        lambda rows: [owned_dict(row) for row in rows],
+    ),
+    (
+        "trade_with_friend",
+        lambda s: s.query(Trade).filter(Trade.status == TradeStatus.pending),
+        lambda s: s.query(
+            Trade.id,
+            Trade.requester_id,
+            Trade.receiver_id,
+            Trade.requester_pokemon_id,
+            Trade.receiver_pokemon_id,
+            Trade.status,
+            Trade.created_at,
+            Trade.decided_at,
+        ).filter(Trade.status == TradeStatus.pending),
+        lambda rows: [trade_dict(row) for row in rows],
+    ),
+    (
+        "blocked_pokemon",
+        lambda s: s.query(Trade).filter(Trade.requester_id == "P0"),
+        lambda s: s.query(
+            Trade.requester_pokemon_id, Trade.receiver_pokemon_id
+        ).filter(Trade.requester_id == "P0"),
+        blocked_ids,
+    ),
+    (
+        "friend_lookup",
+        lambda s: s.query(Player).filter(Player.id.in_(["P0", "P1"])),
+        lambda s: s.query(Player.id, Player.username, Player.profile_picture).filter(
+            Player.id.in_(["P0", "P1"])
+        ),
+        lambda rows: [
+            {"id": r.id, "username": r.username, "profile_picture": r.profile_picture}
+            for r in rows
+        ],
+    ),
+]
+
+
+def measure(Session, build_query, serialize, repeat):
+    best = None
+    rows = 0
+    for _ in range(repeat):
+        # Sesión nueva en cada vuelta, como en cada petición
+        session = Session()
+        start = time.perf_counter()
+        result = serialize(build_query(session).all())
+        elapsed = time.perf_counter() - start
+        session.close()
+
+        rows = len(result)
+        best = elapsed if best is None else min(best, elapsed)
+
+    return rows, rows / best if best else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(
+        engine,
+        tables=[t.__table__ for t in (Player, PokemonStat, PokemonOwned, Trade)],
+    )
+    Session = sessionmaker(bind=engine)
+
+    session = Session()
+    seed(session, args.rows)
+    session.close()
+
+    print(f"{'endpoint':<20} {'rows':>7} {'entities/s':>12} {'columns/s':>12} {'gain':>6}")
+    for name, entity_query, column_query, serialize in CASES:
+        rows, entity_rate = measure(Session, entity_query, serialize, args.repeat)
+        _, column_rate = measure(Session, column_query, serialize, args.repeat)
+        gain = column_rate / entity_rate if entity_rate else 0.0
+        print(
+            f"{name:<20} {rows:>7} {entity_rate:>12,.0f} {column_rate:>12,.0f} {gain:>5.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""Offline capture-odds simulator and sampler benchmark.
+
+Loads pokemon_stat from a CSV (pokedex_number, name, capture_rate columns)
+or from a SQLite file with a pokemon_stat table, runs millions of simulated
+captures with NumPy through two engines and prints the observed vs expected
+odds per species, a chi-square check and draws/sec for each engine:
+
+  legacy  choose_capture_rate + random.choice (rate first, then species)
+  alias   Vose alias table, the sampler used by /capture_pokemon
+
+The scalar Python paths that actually run in the API are timed as well.
+NumPy is only needed here, it is not part of the app requirements:
+
+  pip install numpy
+  python tools/capture_simulator.py pokemon.csv --draws 5000000
+"""
+
+import argparse
+import csv
+import math
+import os
+import random
+import sqlite3
+import sys
+import time
+from collections import namedtuple
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers.helpers import AliasSampler, capture_weights, choose_capture_rate
+
+StatRow = namedtuple("StatRow", ["pokedex_number", "name", "capture_rate"])
+
+
+def parse_rate(value):
+    # The public pokemon.csv has a few values like "30 (Meteorite)255 (Core)"
+    if value is None:
+        return None
+    digits = ""
+    for char in str(value).strip():
+        if not char.isdigit():
+            break
+        digits += char
+    return int(digits) if digits else None
+
+
+def load_csv(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return [
+            StatRow(int(row["pokedex_number"]), row["name"], parse_rate(row["capture_rate"]))
+            for row in csv.DictReader(f)
+        ]
+
+
+def load_sqlite(path):
+    connection = sqlite3.connect(path)
+    try:
+        rows = connection.execute(
+            "SELECT pokedex_number, name, capture_rate FROM pokemon_stat"
+        ).fetchall()
+    finally:
+        connection.close()
+    return [StatRow(number, name, parse_rate(rate)) for number, name, rate in rows]
+
+
+def load_stats(path):
+    if path.lower().endswith(".csv"):
+        return load_csv(path)
+    return load_sqlite(path)
+
+
+class LegacyEngine:
+    # Vectorised copy of the old GROUP BY + choose_capture_rate + random.choice
+    name = "legacy"
+
+    def __init__(self, rows):
+        species_by_rate = {}
+        for row in rows:
+            if row.capture_rate is not None:
+                species_by_rate.setdefault(row.capture_rate, []).append(row)
+
+        self.species = []
+        offsets = []
+        counts = []
+        for species in species_by_rate.values():
+            offsets.append(len(self.species))
+            counts.append(len(species))
+            self.species.extend(species)
+
+        self.offsets = np.array(offsets, dtype=np.int64)
+        self.counts = np.array(counts, dtype=np.int64)
+        self.rate_cdf = np.cumsum(self.counts) / self.counts.sum()
+
+    def draw(self, rng, size):
+        rate = np.searchsorted(self.rate_cdf, rng.random(size), side="right")
+        rate = np.minimum(rate, len(self.counts) - 1)
+        inside = (rng.random(size) * self.counts[rate]).astype(np.int64)
+        return self.offsets[rate] + inside
+
+
+class AliasEngine:
+    name = "alias"
+
+    def __init__(self, rows):
+        items, weights = capture_weights(rows)
+        sampler = AliasSampler(items, weights)
+
+        self.species = list(sampler.items)
+        self.threshold = np.array(sampler.prob, dtype=np.float64) / sampler.total
+        self.alias = np.array(sampler.alias, dtype=np.int64)
+
+    def draw(self, rng, size):
+        column = rng.integers(0, len(self.species), size)
+        keep = rng.random(size) < self.threshold[column]
+        return np.where(keep, column, self.alias[column])
+
+
+def expected_odds(rows):
+    # Exact two-stage probability: P(rate) * P(species | rate)
+    counts = {}
+    for row in rows:
+        if row.capture_rate is not None:
+            counts[row.capture_rate] = counts.get(row.capture_rate, 0) + 1
+    tickets = sum(counts.values())
+
+    return {
+        row.pokedex_number: (counts[row.capture_rate] / tickets)
+        * (1 / counts[row.capture_rate])
+        for row in rows
+        if row.capture_rate is not None
+    }
+
+
+def chi_square(observed, expected, draws):
+    stat = 0.0
+    for number, probability in expected.items():
+        wanted = probability * draws
+        stat += (observed.get(number, 0) - wanted) ** 2 / wanted
+
+    # Wilson-Hilferty approximation of the upper tail
+    df = max(len(expected) - 1, 1)
+    z = ((stat / df) ** (1 / 3) - (1 - 2 / (9 * df))) / math.sqrt(2 / (9 * df))
+    p_value = 0.5 * math.erfc(z / math.sqrt(2))
+
+    return stat, df, p_value
+
+
+def run_engine(engine, rng, draws, chunk):
+    observed = np.zeros(len(engine.species), dtype=np.int64)
+
+    start = time.perf_counter()
+    remaining = draws
+    while remaining:
+        size = min(chunk, remaining)
+        observed += np.bincount(engine.draw(rng, size), minlength=len(engine.species))
+        remaining -= size
+    elapsed = time.perf_counter() - start
+
+    by_number = {
+        row[0]: int(count) for row, count in zip(engine.species, observed)
+    }
+    return by_number, draws / elapsed
+
+
+def time_scalar(rows, draws):
+    counts = {}
+    numbers_by_rate = {}
+    for row in rows:
+        if row.capture_rate is not None:
+            counts[row.capture_rate] = counts.get(row.capture_rate, 0) + 1
+            numbers_by_rate.setdefault(row.capture_rate, []).append(row.pokedex_number)
+
+    start = time.perf_counter()
+    for _ in range(draws):
+        random.choice(numbers_by_rate[choose_capture_rate(counts)])
+    legacy = draws / (time.perf_counter() - start)
+
+    sampler = AliasSampler(*capture_weights(rows))
+    start = time.perf_counter()
+    for _ in range(draws):
+        sampler.draw()
+    alias = draws / (time.perf_counter() - start)
+
+    return legacy, alias
+
+
+def report(engine_name, rows, observed, expected, draws, rate, limit, alpha):
+    names = {row.pokedex_number: row.name for row in rows}
+    stat, df, p_value = chi_square(observed, expected, draws)
+
+    print(f"\n== {engine_name}: {rate:,.0f} draws/sec")
+    print(f"chi2={stat:.2f} df={df} p={p_value:.4f} ", end="")
+    print("OK" if p_value > alpha else f"FAIL (p <= {alpha})")
+
+    lines = []
+    for number, probability in expected.items():
+        seen = observed.get(number, 0) / draws
+        lines.append((abs(seen - probability), number, probability, seen))
+    lines.sort(reverse=True)
+    if limit:
+        lines = lines[:limit]
+
+    print(f"{'#':>5} {'name':<16} {'expected':>10} {'observed':>10}")
+    for _, number, probability, seen in lines:
+        print(f"{number:>5} {names[number]:<16} {probability:>10.6f} {seen:>10.6f}")
+
+    return p_value > alpha
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("fixture", help="pokemon_stat as .csv or SQLite file")
+    parser.add_argument("--draws", type=int, default=2_000_000)
+    parser.add_argument("--chunk", type=int, default=1_000_000)
+    parser.add_argument("--scalar-draws", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--alpha", type=float, default=0.001)
+    parser.add_argument(
+        "--limit", type=int, default=20, help="species to print, worst first (0 = all)"
+    )
+    args = parser.parse_args()
+
+    rows = load_stats(args.fixture)
+    expected = expected_odds(rows)
+    if not expected:
+        sys.exit("No species with a capture rate in the fixture")
+
+    rng = np.random.default_rng(args.seed)
+    print(f"{len(expected)} capturable species, {args.draws:,} draws per engine")
+
+    ok = True
+    for engine in (LegacyEngine(rows), AliasEngine(rows)):
+        observed, rate = run_engine(engine, rng, args.draws, args.chunk)
+        ok &= report(
+            engine.name, rows, observed, expected, args.draws, rate, args.limit, args.alpha
+        )
+
+    if args.scalar_draws:
+        legacy, alias = time_scalar(rows, args.scalar_draws)
+        print(f"\nPython path: legacy {legacy:,.0f} draws/sec, alias {alias:,.0f} draws/sec")
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""EXPLAIN regression check for the friend pair lookups.
+
+Runs EXPLAIN on MySQL for every statement routes/friends.py builds with
+pair_filter and fails unless each one reads the friend table through the
+unique (id_min, id_max) index, i.e. no index merge and no full scan:
+
+  DB_URL=mysql+pymysql://... python tools/explain_friend_queries.py
+"""
+
+import os
+import sys
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, delete, select, text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers.friend_pairs import pair_filter
+from models.models import t_friend
+
+EXPECTED_KEY = "id_min"
+ALLOWED_ACCESS = {"const", "eq_ref", "ref", "range"}
+
+# Mezcla mayúsculas/minúsculas a propósito, como los IDs viejos
+PLAYER, OTHER = "aB3dE", "Zx9yW"
+
+STATEMENTS = {
+    "lookup": select(t_friend).where(pair_filter(PLAYER, OTHER)),
+    "accept_request": t_friend.update()
+    .where(pair_filter(PLAYER, OTHER), t_friend.c.approved.is_(False))
+    .values(approved=True),
+    "deny_requests": delete(t_friend).where(
+        pair_filter(PLAYER, OTHER), t_friend.c.approved.is_(False)
+    ),
+    "remove_friend": delete(t_friend).where(
+        pair_filter(PLAYER, OTHER), t_friend.c.approved.is_(True)
+    ),
+}
+
+
+def explain(connection, statement):
+    sql = str(
+        statement.compile(
+            dialect=connection.dialect, compile_kwargs={"literal_binds": True}
+        )
+    )
+    result = connection.execute(text(f"EXPLAIN {sql}"))
+    return [dict(row._mapping) for row in result]
+
+
+def check(name, plan):
+    problems = []
+    for row in plan:
+        if row.get("table") != t_friend.name:
+            continue
+        if row.get("key") != EXPECTED_KEY:
+            problems.append(f"uses key {row.get('key')!r}")
+        if row.get("type") not in ALLOWED_ACCESS:
+            problems.append(f"access type {row.get('type')!r}")
+
+    if not any(row.get("table") == t_friend.name for row in plan):
+        problems.append("friend table not in plan")
+
+    status = "OK" if not problems else "FAIL: " + ", ".join(problems)
+    print(f"{name:<16} {status}")
+    for row in plan:
+        print(f"    type={row.get('type')} key={row.get('key')} rows={row.get('rows')}")
+
+    return not problems
+
+
+def main():
+    load_dotenv()
+    engine = create_engine(os.getenv("DB_URL"))
+    if engine.dialect.name != "mysql":
+        sys.exit("EXPLAIN checks need the MySQL database (DB_URL)")
+
+    ok = True
+    with engine.connect() as connection:
+        for name, statement in STATEMENTS.items():
+            ok &= check(name, explain(connection, statement))
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
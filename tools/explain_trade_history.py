@@ -0,0 +1,88 @@
+"""EXPLAIN regression check for the trade history page.
+
+Runs EXPLAIN on MySQL for the /trade/history query (first page and a page
+after a cursor) and fails unless every read of the trade table is a range
+over one of the (player, status, created_at) indexes with no filesort, i.e.
+each page stops after limit + 1 index entries per side and status:
+
+  DB_URL=mysql+pymysql://... python tools/explain_trade_history.py
+"""
+
+import os
+import sys
+from datetime import datetime
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, select, text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+load_dotenv()
+
+from models.models import Trade
+from routes.trade import HISTORY_STATUSES, history_query
+
+EXPECTED_KEYS = {"ix_trade_requester_status_created", "ix_trade_receiver_status_created"}
+ALLOWED_ACCESS = {"ref", "range"}
+
+PLAYER = "aB3dE"
+LIMIT = 50
+CURSOR = (datetime(2024, 1, 1, 12, 0, 0), "01HMZ8Q4J6V0000000000000")
+
+STATEMENTS = {
+    "first_page": select(history_query(PLAYER, HISTORY_STATUSES, LIMIT)),
+    "after_cursor": select(history_query(PLAYER, HISTORY_STATUSES, LIMIT, CURSOR)),
+}
+
+
+def explain(connection, statement):
+    sql = str(
+        statement.compile(
+            dialect=connection.dialect, compile_kwargs={"literal_binds": True}
+        )
+    )
+    result = connection.execute(text(f"EXPLAIN {sql}"))
+    return [dict(row._mapping) for row in result]
+
+
+def check(name, plan):
+    problems = []
+    reads = [row for row in plan if row.get("table") == Trade.__tablename__]
+    for row in reads:
+        if row.get("key") not in EXPECTED_KEYS:
+            problems.append(f"uses key {row.get('key')!r}")
+        if row.get("type") not in ALLOWED_ACCESS:
+            problems.append(f"access type {row.get('type')!r}")
+        if "filesort" in (row.get("Extra") or ""):
+            problems.append(f"filesort on {row.get('key')!r}")
+
+    expected_reads = 2 * len(HISTORY_STATUSES)
+    if len(reads) != expected_reads:
+        problems.append(f"{len(reads)} trade reads, expected {expected_reads}")
+
+    status = "OK" if not problems else "FAIL: " + ", ".join(problems)
+    print(f"{name:<16} {status}")
+    for row in plan:
+        print(
+            f"    table={row.get('table')} type={row.get('type')} "
+            f"key={row.get('key')} rows={row.get('rows')} extra={row.get('Extra')}"
+        )
+
+    return not problems
+
+
+def main():
+    engine = create_engine(os.getenv("DB_URL"))
+    if engine.dialect.name != "mysql":
+        sys.exit("EXPLAIN checks need the MySQL database (DB_URL)")
+
+    ok = True
+    with engine.connect() as connection:
+        for name, statement in STATEMENTS.items():
+            ok &= check(name, explain(connection, statement))
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""Stress check for concurrent trade confirmations.
+
+Creates two throwaway players with one Pokémon each and a pending trade
+between them, then fires parallel confirmations of that trade from separate
+connections. Exactly one must win, and each Pokémon must end up with the
+other player. The seeded rows are removed afterwards:
+
+  DB_URL=mysql+pymysql://... python tools/stress_trade_confirm.py --workers 16 --rounds 20
+"""
+
+import argparse
+import os
+import sys
+import threading
+from collections import Counter
+from datetime import datetime
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, delete
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+load_dotenv()
+
+from helpers.collection_stats import rebuild_collection_stats
+from helpers.ids import new_id
+from helpers.pokemon_stats import get_pokemon_stats, reload_pokemon_stats
+from models.models import (
+    Player,
+    PlayerCollectionStats,
+    PokemonOwned,
+    Trade,
+    TradeItem,
+    TradeStatus,
+)
+from routes.trade import confirm_trade
+
+
+def seed_round(Session, pokedex_number):
+    requester_id, receiver_id = new_id(32), new_id(32)
+    requester_pokemon_id, receiver_pokemon_id = new_id(24), new_id(24)
+    trade_id = new_id()
+
+    session = Session()
+    try:
+        session.add_all(
+            Player(id=pid, username=pid[-12:], email=f"{pid}@stress", password="x")
+            for pid in (requester_id, receiver_id)
+        )
+        session.flush()
+        session.add_all(
+            [
+                PokemonOwned(
+                    id=requester_pokemon_id,
+                    player_id=requester_id,
+                    pokedex_number=pokedex_number,
+                    in_team=False,
+                    obtained_at=datetime.now(),
+                ),
+                PokemonOwned(
+                    id=receiver_pokemon_id,
+                    player_id=receiver_id,
+                    pokedex_number=pokedex_number,
+                    in_team=False,
+                    obtained_at=datetime.now(),
+                ),
+            ]
+        )
+        session.flush()
+        session.add(
+            Trade(
+                id=trade_id,
+                requester_id=requester_id,
+                receiver_id=receiver_id,
+                requester_pokemon_id=requester_pokemon_id,
+                receiver_pokemon_id=receiver_pokemon_id,
+                status=TradeStatus.pending,
+                created_at=datetime.now(),
+            )
+        )
+        session.flush()
+        session.add_all(
+            TradeItem(trade_id=trade_id, pokemon_id=pokemon_id, player_id=player_id)
+            for pokemon_id, player_id in (
+                (requester_pokemon_id, requester_id),
+                (receiver_pokemon_id, receiver_id),
+            )
+        )
+        rebuild_collection_stats(session, [requester_id, receiver_id])
+        session.commit()
+    finally:
+        session.close()
+
+    return {
+        "trade_id": trade_id,
+        "requester_id": requester_id,
+        "receiver_id": receiver_id,
+        "requester_pokemon_id": requester_pokemon_id,
+        "receiver_pokemon_id": receiver_pokemon_id,
+    }
+
+
+def confirm_worker(Session, barrier, trade, outcomes):
+    session = Session()
+    try:
+        barrier.wait()
+        status, _, _ = confirm_trade(session, trade["trade_id"], trade["receiver_id"])
+        if status == 202:
+            session.commit()
+        else:
+            session.rollback()
+        outcomes.append(status)
+    except Exception as e:
+        session.rollback()
+        outcomes.append(type(e).__name__)
+    finally:
+        session.close()
+
+
+def verify_round(Session, trade):
+    session = Session()
+    try:
+        owners = dict(
+            session.query(PokemonOwned.id, PokemonOwned.player_id).filter(
+                PokemonOwned.id.in_(
+                    [trade["requester_pokemon_id"], trade["receiver_pokemon_id"]]
+                )
+            )
+        )
+        status = (
+            session.query(Trade.status).filter(Trade.id == trade["trade_id"]).scalar()
+        )
+        totals = dict(
+            session.query(
+                PlayerCollectionStats.player_id, PlayerCollectionStats.total
+            ).filter(
+                PlayerCollectionStats.player_id.in_(
+                    [trade["requester_id"], trade["receiver_id"]]
+                )
+            )
+        )
+    finally:
+        session.close()
+
+    problems = []
+    if owners.get(trade["requester_pokemon_id"]) != trade["receiver_id"]:
+        problems.append("requester pokémon not with receiver")
+    if owners.get(trade["receiver_pokemon_id"]) != trade["requester_id"]:
+        problems.append("receiver pokémon not with requester")
+    if status != TradeStatus.accepted:
+        problems.append(f"trade status {status}")
+    if set(totals.values()) != {1}:
+        problems.append(f"collection totals {totals}")
+    return problems
+
+
+def cleanup(Session, trades):
+    player_ids = [pid for t in trades for pid in (t["requester_id"], t["receiver_id"])]
+    session = Session()
+    try:
+        trade_ids = [t["trade_id"] for t in trades]
+        session.execute(delete(TradeItem).where(TradeItem.trade_id.in_(trade_ids)))
+        session.execute(delete(Trade).where(Trade.id.in_(trade_ids)))
+        session.execute(delete(PokemonOwned).where(PokemonOwned.player_id.in_(player_ids)))
+        session.execute(
+            delete(PlayerCollectionStats).where(
+                PlayerCollectionStats.player_id.in_(player_ids)
+            )
+        )
+        session.execute(delete(Player).where(Player.id.in_(player_ids)))
+        session.commit()
+    finally:
+        session.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    engine = create_engine(
+        os.getenv("DB_URL"), pool_size=args.workers, max_overflow=0
+    )
+    if engine.dialect.name != "mysql":
+        print("warning: row locks are only exercised on MySQL (DB_URL)")
+    Session = sessionmaker(bind=engine)
+
+    reload_pokemon_stats()
+    if not get_pokemon_stats():
+        sys.exit("pokemon_stat is empty, seed it first")
+    pokedex_number = min(get_pokemon_stats())
+
+    trades = []
+    failures = 0
+    try:
+        for round_number in range(args.rounds):
+            trade = seed_round(Session, pokedex_number)
+            trades.append(trade)
+
+            outcomes = []
+            barrier = threading.Barrier(args.workers)
+            workers = [
+                threading.Thread(
+                    target=confirm_worker, args=(Session, barrier, trade, outcomes)
+                )
+                for _ in range(args.workers)
+            ]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+
+            counts = Counter(outcomes)
+            problems = verify_round(Session, trade)
+            if counts[202] != 1:
+                problems.append(f"{counts[202]} confirmations succeeded")
+
+            failures += bool(problems)
+            status = "OK" if not problems else "FAIL: " + ", ".join(problems)
+            print(f"round {round_number:>3} {dict(counts)} {status}")
+    finally:
+        cleanup(Session, trades)
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()